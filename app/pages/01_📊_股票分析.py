@@ -4,64 +4,17 @@ import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
 from datetime import datetime, timedelta
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from src.data_manager import data_manager
 
 st.set_page_config(page_title="股票分析", page_icon="📊", layout="wide")
 
 st.title("📊 股票分析")
 st.markdown("### 个股技术分析与基本面分析")
 
-# 简单的数据生成函数（内联定义，避免导入问题）
-def generate_stock_data(ticker, period="1y"):
-    """生成模拟股票数据"""
-    
-    # 根据周期确定天数
-    period_days = {
-        "1mo": 30, "3mo": 90, "6mo": 180,
-        "1y": 252, "2y": 504, "5y": 1260
-    }
-    days = period_days.get(period, 252)
-    
-    # 根据股票代码设置不同的参数
-    if ticker in ["AAPL", "MSFT", "GOOGL", "AMZN"]:
-        base_price = np.random.uniform(100, 500)
-        daily_return = 0.0005
-        volatility = 0.015
-    elif ticker in ["TSLA", "NVDA"]:
-        base_price = np.random.uniform(50, 300)
-        daily_return = 0.0008
-        volatility = 0.025
-    elif ticker in ["SPY", "VTI", "QQQ"]:
-        base_price = np.random.uniform(200, 500)
-        daily_return = 0.0003
-        volatility = 0.012
-    else:
-        base_price = np.random.uniform(50, 200)
-        daily_return = 0.0004
-        volatility = 0.018
-    
-    # 生成日期序列
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=days)
-    dates = pd.date_range(start=start_date, end=end_date, freq='B')[:days]
-    
-    # 生成价格序列
-    n = len(dates)
-    returns = np.random.normal(daily_return, volatility, n)
-    prices = base_price * np.exp(np.cumsum(returns))
-    
-    # 创建DataFrame
-    data = pd.DataFrame(index=dates[:len(prices)])
-    data['Close'] = prices
-    data['Open'] = data['Close'].shift(1) * (1 + np.random.normal(0, 0.001, len(data)))
-    data['High'] = data[['Open', 'Close']].max(axis=1) * (1 + np.random.uniform(0, 0.02, len(data)))
-    data['Low'] = data[['Open', 'Close']].min(axis=1) * (1 - np.random.uniform(0, 0.02, len(data)))
-    data['Volume'] = np.random.randint(1000000, 10000000, len(data))
-    
-    # 填充NaN值
-    data = data.ffill().bfill()
-    
-    return data
-
 # 侧边栏
 st.sidebar.header("分析设置")
 
@@ -81,6 +34,16 @@ for idx, stock in enumerate(hot_stocks):
 # 时间周期
 period = st.sidebar.selectbox("时间周期", ["1mo", "3mo", "6mo", "1y", "2y", "5y"], index=3)
 
+# 自定义日期范围（在完整历史上切片，与周期选择的数据一致）
+start_date, end_date = None, None
+if st.sidebar.checkbox("自定义日期范围", False):
+    date_range = st.sidebar.date_input(
+        "日期范围",
+        (datetime.now().date() - timedelta(days=365), datetime.now().date())
+    )
+    if isinstance(date_range, (list, tuple)) and len(date_range) == 2:
+        start_date, end_date = date_range
+
 # 显示数据源说明
 st.sidebar.markdown("---")
 st.sidebar.info("""
@@ -93,15 +56,16 @@ st.sidebar.info("""
 if st.sidebar.button("开始分析", type="primary", use_container_width=True):
     with st.spinner(f"正在分析 {ticker}..."):
         try:
-            # 生成数据
-            data = generate_stock_data(ticker, period)
+            # 获取数据
+            series = data_manager.get_price_series(ticker, period, start=start_date, end=end_date)
+            source = series.source
             
             # 显示数据来源标签
             st.markdown(f"""
             <div style="display: flex; align-items: center; margin-bottom: 1rem;">
                 <h4 style="margin: 0;">{ticker} - 股票分析</h4>
                 <span style="background-color: #F59E0B; color: white; padding: 0.25rem 0.75rem; border-radius: 12px; font-size: 0.8rem; font-weight: bold; margin-left: 0.5rem;">
-                    模拟数据
+                    {"模拟数据" if source == "mock" else source}
                 </span>
             </div>
             """, unsafe_allow_html=True)
@@ -115,18 +79,18 @@ if st.sidebar.button("开始分析", type="primary", use_container_width=True):
                 
                 # K线图
                 fig1.add_trace(go.Candlestick(
-                    x=data.index,
-                    open=data['Open'],
-                    high=data['High'],
-                    low=data['Low'],
-                    close=data['Close'],
+                    x=series.index(),
+                    open=series.open,
+                    high=series.high,
+                    low=series.low,
+                    close=series.close,
                     name="OHLC",
                     increasing_line_color='#10B981',
                     decreasing_line_color='#EF4444'
                 ))
                 
                 fig1.update_layout(
-                    title=f"{ticker} 价格走势 ({period})",
+                    title=f"{ticker} 价格走势 ({f'{start_date} ~ {end_date}' if start_date else period})",
                     yaxis_title="价格",
                     xaxis_title="日期",
                     height=500,
@@ -141,23 +105,23 @@ if st.sidebar.button("开始分析", type="primary", use_container_width=True):
                 
                 col1, col2, col3, col4 = st.columns(4)
                 
-                price_change = ((data['Close'].iloc[-1] - data['Close'].iloc[0]) / data['Close'].iloc[0] * 100)
+                price_change = ((series.close[-1] - series.close[0]) / series.close[0] * 100)
                 
                 with col1:
-                    st.metric("当前价格", f"${data['Close'].iloc[-1]:.2f}")
+                    st.metric("当前价格", f"${series.close[-1]:.2f}")
                 with col2:
                     st.metric("期间涨跌", f"{price_change:.2f}%")
                 with col3:
-                    st.metric("最高价", f"${data['High'].max():.2f}")
+                    st.metric("最高价", f"${series.high.max():.2f}")
                 with col4:
-                    st.metric("最低价", f"${data['Low'].min():.2f}")
+                    st.metric("最低价", f"${series.low.min():.2f}")
             
             with tab2:
                 # 技术指标
                 st.subheader("技术分析")
                 
                 # 计算收益率
-                returns = data['Close'].pct_change().dropna()
+                returns = series.returns()
                 
                 if len(returns) > 0:
                     # 收益率分布
@@ -175,12 +139,12 @@ if st.sidebar.button("开始分析", type="primary", use_container_width=True):
                     st.subheader("技术指标汇总")
                     
                     annual_return = returns.mean() * 252
-                    annual_volatility = returns.std() * np.sqrt(252)
+                    annual_volatility = returns.std(ddof=1) * np.sqrt(252)
                     sharpe_ratio = annual_return / annual_volatility if annual_volatility > 0 else 0
                     
                     tech_metrics = {
                         "平均日收益率": f"{returns.mean()*100:.4f}%",
-                        "日收益率标准差": f"{returns.std()*100:.4f}%",
+                        "日收益率标准差": f"{returns.std(ddof=1)*100:.4f}%",
                         "年化收益率": f"{annual_return*100:.2f}%",
                         "年化波动率": f"{annual_volatility*100:.2f}%",
                         "夏普比率": f"{sharpe_ratio:.2f}",
@@ -3,7 +3,20 @@ import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
-from datetime import datetime, timedelta
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from src.data_manager import data_manager
+from src.risk_metrics import batch_risk_metrics
+from src.online_stats import OnlineRiskStats
+from src.stress_test import stress_test
+from src.var_attribution import var_attribution
+from src.drawdown import drawdown_stats
+from src.optimizer import MeanVarianceOptimizer
+from src.covariance import covariance_service
+from src.risk_parity import risk_parity
+from src.backtest import make_configs, run_backtest
 
 st.set_page_config(page_title="投资组合", page_icon="⚖️", layout="wide")
 
@@ -11,33 +24,10 @@ st.title("⚖️ 投资组合分析")
 st.markdown("### 构建和优化您的投资组合")
 
 # 模拟数据生成函数
-def generate_portfolio_data(tickers, days=252):
-    """生成模拟投资组合数据"""
-    dates = pd.date_range(end=datetime.now(), periods=days, freq='B')
-    portfolio_data = pd.DataFrame(index=dates)
-    
-    for ticker in tickers:
-        # 根据股票代码生成不同的参数
-        if ticker in ["AAPL", "MSFT", "GOOGL"]:
-            base_price = np.random.uniform(100, 300)
-            daily_return = 0.0005
-            volatility = 0.015
-        elif ticker in ["TSLA", "NVDA"]:
-            base_price = np.random.uniform(50, 200)
-            daily_return = 0.0008
-            volatility = 0.025
-        else:
-            base_price = np.random.uniform(50, 150)
-            daily_return = 0.0004
-            volatility = 0.018
-        
-        # 生成价格序列
-        returns = np.random.normal(daily_return, volatility, days)
-        prices = base_price * np.exp(np.cumsum(returns))
-        
-        portfolio_data[ticker] = prices
-    
-    return portfolio_data
+def generate_portfolio_data(tickers, period="1y"):
+    """生成模拟投资组合数据（收盘价矩阵）"""
+    panel, _ = data_manager.get_panel_data(tickers, period)
+    return panel['Close']
 
 # 侧边栏配置
 st.sidebar.header("投资组合设置")
@@ -52,6 +42,14 @@ portfolio_stocks = st.sidebar.text_area(
 # 权重设置
 st.sidebar.subheader("权重设置")
 equal_weights = st.sidebar.checkbox("使用等权重", True)
+if not equal_weights:
+    strategy = st.sidebar.selectbox("优化策略", ["最大化夏普比率", "最小化波动率", "风险平价"])
+    max_weight = st.sidebar.slider("单一资产权重上限", 0.1, 1.0, 1.0, 0.05)
+
+# 回测设置（页面内的控件会触发重跑并清空分析结果，因此放在侧边栏）
+st.sidebar.subheader("回测设置")
+cost_bps = st.sidebar.number_input("交易成本 (基点/单边换手)", 0.0, 100.0, 10.0, 1.0)
+cash_pct = st.sidebar.slider("现金比例 (%)", 0, 50, 0, 5)
 
 # 示例组合
 st.sidebar.markdown("### 📋 示例组合")
@@ -73,12 +71,28 @@ if st.sidebar.button("开始分析", type="primary"):
                 # 生成数据
                 data = generate_portfolio_data(tickers)
                 
-                # 等权重组合
-                weights = np.ones(len(tickers)) / len(tickers)
+                # 均值与协方差由协方差服务缓存，优化与风险归因共用同一矩阵
+                asset_returns = data.pct_change().dropna()
+                mean_vec, cov_matrix = covariance_service.get(asset_returns, window=len(asset_returns))
+
+                # 均值-方差优化器（只做多，权重上限可调）
+                upper = 1.0 if equal_weights else max(max_weight, 1.0 / len(tickers))
+                optimizer = MeanVarianceOptimizer(mean_vec, cov_matrix, bounds=(0.0, upper), tickers=data.columns)
+                frontier = optimizer.efficient_frontier(100)
+
+                if equal_weights:
+                    weights = np.ones(len(tickers)) / len(tickers)
+                elif strategy == "最小化波动率":
+                    weights = optimizer.min_variance()[tickers].to_numpy()
+                elif strategy == "风险平价":
+                    # 等风险贡献（不受权重上限约束）
+                    weights = risk_parity(cov_matrix, tickers=data.columns)[tickers].to_numpy()
+                else:
+                    weights = optimizer.max_sharpe(frontier)[tickers].to_numpy()
                 weight_dict = dict(zip(tickers, weights))
                 
                 # 标签页
-                tab1, tab2 = st.tabs(["📊 组合表现", "📈 资产配置"])
+                tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(["📊 组合表现", "📈 资产配置", "🧨 压力测试", "🎯 风险归因", "📉 有效前沿", "🔁 回测分析"])
                 
                 with tab1:
                     st.subheader("投资组合表现")
@@ -110,13 +124,14 @@ if st.sidebar.button("开始分析", type="primary"):
                     # 性能指标
                     st.subheader("性能指标")
                     
-                    annual_return = portfolio_returns.mean() * 252
-                    annual_volatility = portfolio_returns.std() * np.sqrt(252)
-                    sharpe_ratio = annual_return / annual_volatility if annual_volatility > 0 else 0
-                    
-                    # 最大回撤
-                    cumulative = (1 + portfolio_returns).cumprod()
-                    max_dd = (cumulative / cumulative.cummax() - 1).min()
+                    # 展示窗口为滚动的最近 252 个交易日，每次直接对当前窗口单遍计算
+                    portfolio_stats = OnlineRiskStats.from_returns(portfolio_returns.to_numpy())
+
+                    stats_metrics = portfolio_stats.metrics(risk_free_rate=0)
+                    annual_return = stats_metrics['annual_return']
+                    annual_volatility = stats_metrics['annual_volatility']
+                    sharpe_ratio = stats_metrics['sharpe_ratio']
+                    max_dd = stats_metrics['max_drawdown']
                     
                     col1, col2, col3, col4 = st.columns(4)
                     with col1:
@@ -127,6 +142,19 @@ if st.sidebar.button("开始分析", type="primary"):
                         st.metric("夏普比率", f"{sharpe_ratio:.2f}")
                     with col4:
                         st.metric("最大回撤", f"{max_dd*100:.2f}%")
+
+                    # 回撤区间
+                    st.subheader("主要回撤区间")
+                    drawdown = drawdown_stats(portfolio_returns, top_k=3)
+                    episodes = drawdown.episodes()
+                    st.caption(f"水下时间占比 {drawdown.time_under_water[0]*100:.1f}%，"
+                               f"Calmar 比率 {drawdown.calmar[0]:.2f}")
+                    st.dataframe(pd.DataFrame({
+                        '回撤幅度': (episodes['depth'] * 100).map("{:.2f}%".format),
+                        '峰值日期': episodes['peak_date'],
+                        '谷底日期': episodes['trough_date'],
+                        '恢复日期': episodes['recovery_date'],
+                    }), use_container_width=True)
                 
                 with tab2:
                     st.subheader("资产配置")
@@ -149,6 +177,165 @@ if st.sidebar.button("开始分析", type="primary"):
                     })
                     
                     st.dataframe(weights_df, use_container_width=True)
+
+                    # 各资产风险指标（一次批量计算）
+                    st.subheader("各资产风险指标")
+                    asset_metrics = batch_risk_metrics(data.pct_change().dropna(how='all'), (0.95, 0.99))
+                    risk_df = pd.DataFrame({
+                        '年化收益': (asset_metrics['annual_return'] * 100).map("{:.2f}%".format),
+                        '年化波动': (asset_metrics['annual_volatility'] * 100).map("{:.2f}%".format),
+                        '夏普比率': asset_metrics['sharpe_ratio'].map("{:.2f}".format),
+                        'VaR (95%)': (asset_metrics['var_95'] * 100).map("{:.2f}%".format),
+                        'CVaR (95%)': (asset_metrics['cvar_95'] * 100).map("{:.2f}%".format),
+                        'VaR (99%)': (asset_metrics['var_99'] * 100).map("{:.2f}%".format),
+                        '偏度': asset_metrics['skewness'].map("{:.3f}".format),
+                        '峰度': asset_metrics['kurtosis'].map("{:.3f}".format),
+                    })
+
+                    st.dataframe(risk_df, use_container_width=True)
+
+                with tab3:
+                    st.subheader("情景压力测试")
+
+                    # 历史情景需要较长的历史，使用5年收益率
+                    history_returns = generate_portfolio_data(tickers, "5y").pct_change().dropna(how='all')
+                    stress = stress_test(history_returns, weight_dict)
+
+                    fig3 = go.Figure(go.Bar(
+                        x=stress['组合收益率'] * 100,
+                        y=stress.index,
+                        orientation='h',
+                        marker_color=np.where(stress['组合收益率'] < 0, '#EF4444', '#10B981')
+                    ))
+                    fig3.update_layout(
+                        title="各情景下的组合收益率",
+                        xaxis_title="收益率 (%)",
+                        height=400
+                    )
+
+                    st.plotly_chart(fig3, use_container_width=True)
+
+                    stress_df = stress.assign(组合收益率=(stress['组合收益率'] * 100).map("{:.2f}%".format))
+                    st.dataframe(stress_df[['类型', '组合收益率']], use_container_width=True)
+
+                with tab4:
+                    st.subheader("VaR 风险归因")
+
+                    # 使用与优化器相同的缓存协方差，调整权重时只需矩阵-向量乘积
+                    var_summary, attribution = var_attribution(
+                        [weight_dict[t] for t in data.columns], cov_matrix, mean_vec, 0.95, tickers=list(data.columns)
+                    )
+
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        st.metric("组合 VaR (95%, 参数法)", f"{var_summary['var']*100:.2f}%")
+                    with col2:
+                        st.metric("组合日波动率", f"{var_summary['volatility']*100:.2f}%")
+
+                    fig4 = go.Figure(go.Bar(
+                        x=attribution.index,
+                        y=attribution['component_pct'] * 100,
+                        marker_color='#8B5CF6'
+                    ))
+                    fig4.update_layout(
+                        title="成分 VaR 占比",
+                        yaxis_title="占组合 VaR (%)",
+                        height=400
+                    )
+
+                    st.plotly_chart(fig4, use_container_width=True)
+
+                    attribution_df = pd.DataFrame({
+                        '权重': (attribution['weight'] * 100).map("{:.1f}%".format),
+                        '边际 VaR': (attribution['marginal_var'] * 100).map("{:.3f}%".format),
+                        '成分 VaR': (attribution['component_var'] * 100).map("{:.3f}%".format),
+                        '成分占比': (attribution['component_pct'] * 100).map("{:.1f}%".format),
+                        '增量 VaR': (attribution['incremental_var'] * 100).map("{:.3f}%".format),
+                        '波动贡献占比': (attribution['vol_pct'] * 100).map("{:.1f}%".format),
+                    })
+                    st.dataframe(attribution_df, use_container_width=True)
+
+                with tab5:
+                    st.subheader("有效前沿")
+
+                    frontier_stats, _ = frontier
+                    current = optimizer.portfolio_stats(np.array([weight_dict[t] for t in data.columns]))
+
+                    fig5 = go.Figure()
+                    fig5.add_trace(go.Scatter(
+                        x=frontier_stats['volatility'] * 100,
+                        y=frontier_stats['return'] * 100,
+                        mode='lines',
+                        name='有效前沿',
+                        line=dict(color='#3B82F6', width=3)
+                    ))
+                    fig5.add_trace(go.Scatter(
+                        x=np.sqrt(np.diag(optimizer.cov)) * 100,
+                        y=optimizer.mean * 100,
+                        mode='markers+text',
+                        text=list(data.columns),
+                        textposition='top center',
+                        name='单一资产',
+                        marker=dict(color='#9CA3AF', size=8)
+                    ))
+                    fig5.add_trace(go.Scatter(
+                        x=[current[1] * 100],
+                        y=[current[0] * 100],
+                        mode='markers',
+                        name='当前组合',
+                        marker=dict(color='#EF4444', size=14, symbol='star')
+                    ))
+                    fig5.update_layout(
+                        title="均值-方差有效前沿（年化）",
+                        xaxis_title="波动率 (%)",
+                        yaxis_title="收益率 (%)",
+                        height=500
+                    )
+
+                    st.plotly_chart(fig5, use_container_width=True)
+
+                with tab6:
+                    st.subheader("再平衡策略回测")
+                    st.caption(f"交易成本 {cost_bps:g} 基点，现金比例 {cash_pct}%（在侧边栏调整）")
+
+                    # 日历 × 阈值再平衡的全部组合一次回测
+                    backtest_returns = generate_portfolio_data(tickers, "5y").pct_change().dropna(how='all')
+                    configs = make_configs(
+                        rebalance=(None, 'M', 'Q', 'Y'),
+                        threshold=(None, 0.02, 0.05, 0.10),
+                        cost_bps=(cost_bps,),
+                        cash=(cash_pct / 100,)
+                    )
+                    backtest = run_backtest(backtest_returns, weight_dict, configs)
+                    summary = backtest.summary().sort_values('sharpe_ratio', ascending=False)
+
+                    nav = backtest.nav_frame()
+                    fig6 = go.Figure()
+                    for name in summary.index[:5]:
+                        fig6.add_trace(go.Scatter(
+                            x=nav.index,
+                            y=(nav[name] - 1) * 100,
+                            mode='lines',
+                            name=name
+                        ))
+                    fig6.update_layout(
+                        title="夏普比率前5的再平衡策略累计收益率",
+                        yaxis_title="累计收益率 (%)",
+                        height=450
+                    )
+
+                    st.plotly_chart(fig6, use_container_width=True)
+
+                    backtest_df = pd.DataFrame({
+                        '年化收益率': (summary['cagr'] * 100).map("{:.2f}%".format),
+                        '年化波动率': (summary['annual_volatility'] * 100).map("{:.2f}%".format),
+                        '夏普比率': summary['sharpe_ratio'].map("{:.3f}".format),
+                        '最大回撤': (summary['max_drawdown'] * 100).map("{:.2f}%".format),
+                        '年化换手率': (summary['annual_turnover'] * 100).map("{:.1f}%".format),
+                        '累计成本': (summary['total_cost'] * 100).map("{:.3f}%".format),
+                        '再平衡次数': summary['rebalances'],
+                    })
+                    st.dataframe(backtest_df, use_container_width=True)
                     
         except Exception as e:
             st.error(f"分析失败: {str(e)}")
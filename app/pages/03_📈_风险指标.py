@@ -1,82 +1,22 @@
 ﻿import streamlit as st
-import pandas as pd
-import numpy as np
 import plotly.graph_objects as go
-import plotly.express as px
-from datetime import datetime, timedelta
-from scipy import stats
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from src.data_manager import data_manager
+from src.risk_metrics import calculate_risk_metrics, rolling_var_cvar
+from src.monte_carlo import monte_carlo_var_from_returns
+from src.stress_test import stress_test
+from src.garch import fhs_var
+from src.bootstrap import bootstrap_var_cvar
+from src.var_backtest import var_backtest
 
 st.set_page_config(page_title="风险指标", page_icon="⚠️", layout="wide")
 
 st.title("⚠️ 风险指标计算")
 st.markdown("### 全面的金融风险度量和分析")
 
-# 模拟收益率生成函数
-def generate_returns_data(ticker, days=252):
-    """生成模拟收益率数据"""
-    np.random.seed(hash(ticker) % 10000)
-    
-    # 不同资产的参数
-    if "SPY" in ticker or "VTI" in ticker:
-        mu, sigma = 0.0003, 0.01
-    elif "AAPL" in ticker or "MSFT" in ticker:
-        mu, sigma = 0.0005, 0.015
-    elif "TSLA" in ticker or "NVDA" in ticker:
-        mu, sigma = 0.0008, 0.025
-    else:
-        mu, sigma = 0.0004, 0.018
-    
-    # 生成收益率序列
-    returns = np.zeros(days)
-    for i in range(days):
-        if i == 0:
-            returns[i] = np.random.normal(mu, sigma)
-        else:
-            returns[i] = 0.1 * returns[i-1] + np.random.normal(mu, sigma * (1 + 0.5 * abs(returns[i-1])))
-    
-    # 添加一些极端事件
-    extreme_days = np.random.choice(days, size=max(1, days//50), replace=False)
-    returns[extreme_days] *= np.random.choice([-2, 2], size=len(extreme_days))
-    
-    return pd.Series(returns, index=pd.date_range(end=datetime.now(), periods=days, freq='B'))
-
-# 风险计算函数
-def calculate_risk_metrics(returns, confidence_level=0.95):
-    """计算风险指标"""
-    metrics = {}
-    
-    if len(returns) == 0:
-        return metrics
-    
-    # 基础统计
-    metrics['mean_return'] = returns.mean()
-    metrics['std_return'] = returns.std()
-    
-    # 年化指标
-    metrics['annual_return'] = metrics['mean_return'] * 252
-    metrics['annual_volatility'] = metrics['std_return'] * np.sqrt(252)
-    
-    # VaR (历史模拟法)
-    metrics['var'] = np.percentile(returns, (1 - confidence_level) * 100)
-    
-    # CVaR
-    var_threshold = metrics['var']
-    tail_returns = returns[returns <= var_threshold]
-    metrics['cvar'] = tail_returns.mean() if len(tail_returns) > 0 else metrics['var']
-    
-    # 夏普比率（假设无风险利率2%）
-    risk_free_rate = 0.02
-    if metrics['annual_volatility'] > 0:
-        metrics['sharpe_ratio'] = (metrics['annual_return'] - risk_free_rate) / metrics['annual_volatility']
-    else:
-        metrics['sharpe_ratio'] = 0
-    
-    # 偏度和峰度
-    metrics['skewness'] = stats.skew(returns)
-    metrics['kurtosis'] = stats.kurtosis(returns)
-    
-    return metrics
-
 # 侧边栏
 st.sidebar.header("风险分析设置")
 
@@ -95,12 +35,13 @@ for asset in hot_assets:
 st.sidebar.subheader("风险参数")
 confidence_level = st.sidebar.slider("置信水平", 0.90, 0.99, 0.95, 0.01)
 lookback_days = st.sidebar.slider("回看天数", 30, 1000, 252, 10)
+rolling_window = st.sidebar.slider("滚动窗口", 20, 250, 60, 10)
 
 if st.sidebar.button("计算风险指标", type="primary"):
     with st.spinner("正在计算风险指标..."):
         try:
             # 生成数据
-            returns = generate_returns_data(risk_ticker, lookback_days)
+            returns = data_manager.get_returns_data(risk_ticker, lookback_days)
             
             if len(returns) < 30:
                 st.error("数据不足，无法进行有效的风险分析")
@@ -153,6 +94,16 @@ if st.sidebar.button("计算风险指标", type="primary"):
                 var_line = metrics.get('var', 0) * 100
                 fig1.add_vline(x=var_line, line_dash="dash", line_color="orange", 
                               annotation_text=f"VaR ({confidence_level*100:.0f}%)")
+
+                # VaR / CVaR 的95%置信区间（块自助法，块长约为 n^(1/3)，保留波动聚集）
+                boot = bootstrap_var_cvar(returns, confidence_level, n_resamples=10_000,
+                                          block_size=max(1, round(len(returns) ** (1 / 3)))).iloc[0]
+                fig1.add_vrect(x0=boot['var_lower'] * 100, x1=boot['var_upper'] * 100,
+                               fillcolor="orange", opacity=0.15, line_width=0,
+                               annotation_text="VaR 95%区间", annotation_position="top left")
+                fig1.add_vrect(x0=boot['cvar_lower'] * 100, x1=boot['cvar_upper'] * 100,
+                               fillcolor="#DC2626", opacity=0.12, line_width=0,
+                               annotation_text="CVaR 95%区间", annotation_position="bottom left")
                 
                 fig1.update_layout(
                     title="收益率分布",
@@ -162,7 +113,78 @@ if st.sidebar.button("计算风险指标", type="primary"):
                 )
                 
                 st.plotly_chart(fig1, use_container_width=True)
+
+                # 滚动 VaR / CVaR
+                st.subheader("滚动 VaR / CVaR")
+
+                if len(returns) > rolling_window:
+                    rolling = rolling_var_cvar(returns, rolling_window, confidence_level).dropna()
+
+                    fig_rolling = go.Figure()
+                    fig_rolling.add_trace(go.Scatter(
+                        x=returns.index,
+                        y=returns * 100,
+                        mode='markers',
+                        name="日收益率",
+                        marker=dict(color='#9CA3AF', size=4)
+                    ))
+                    fig_rolling.add_trace(go.Scatter(
+                        x=rolling.index,
+                        y=rolling['var'] * 100,
+                        mode='lines',
+                        name=f"VaR ({confidence_level*100:.0f}%)",
+                        line=dict(color='orange', width=2)
+                    ))
+                    fig_rolling.add_trace(go.Scatter(
+                        x=rolling.index,
+                        y=rolling['cvar'] * 100,
+                        mode='lines',
+                        name="CVaR",
+                        line=dict(color='#DC2626', width=2)
+                    ))
+
+                    fig_rolling.update_layout(
+                        title=f"{rolling_window}日滚动 VaR / CVaR",
+                        xaxis_title="日期",
+                        yaxis_title="收益率 (%)",
+                        height=400
+                    )
+
+                    st.plotly_chart(fig_rolling, use_container_width=True)
+
+                    # 例外回测：前一日的滚动 VaR 对当日收益率
+                    backtest, _, _ = var_backtest(returns.rename(risk_ticker), rolling_window, confidence_level,
+                                                  test_days=len(returns) - rolling_window)
+                    bt = backtest.iloc[0]
+                    bt_cols = st.columns(4)
+                    with bt_cols[0]:
+                        st.metric("例外次数", f"{bt['exceptions']}", f"期望 {bt['expected']:.1f}", delta_color="off")
+                    with bt_cols[1]:
+                        st.metric("Kupiec p值", f"{bt['kupiec_pvalue']:.3f}", "例外频率检验", delta_color="off")
+                    with bt_cols[2]:
+                        st.metric("条件覆盖 p值", f"{bt['cc_pvalue']:.3f}", "Christoffersen", delta_color="off")
+                    with bt_cols[3]:
+                        st.metric("交通灯", f"{bt['zone']}区", f"{bt['observations']} 个交易日", delta_color="off")
+                else:
+                    st.info("回看天数需大于滚动窗口才能计算滚动指标")
                 
+                # 压力测试：回看区间覆盖的历史情景 + 假设情景
+                st.subheader("压力测试")
+
+                stress = stress_test(returns.rename(risk_ticker), {risk_ticker: 1.0})
+                stress_cols = st.columns(min(len(stress), 5))
+                for i, (name, row) in enumerate(stress.iterrows()):
+                    with stress_cols[i % len(stress_cols)]:
+                        st.metric(name, f"{row['组合收益率']*100:.2f}%", row['类型'], delta_color="off")
+
+                # 蒙特卡洛 VaR（单资产，页面内单进程执行）
+                mc = monte_carlo_var_from_returns(returns.rename(risk_ticker), confidence_levels=(confidence_level,),
+                                                  n_paths=100_000, n_workers=1)
+
+                # 过滤历史模拟：按 GARCH(1,1) 预测波动率重新缩放历史残差
+                fhs = fhs_var(returns.rename(risk_ticker), (confidence_level,), window=len(returns)).iloc[0]
+                fhs_label = f"{confidence_level * 100:g}"
+
                 # 详细指标
                 st.subheader("详细风险指标")
                 
@@ -174,10 +196,13 @@ if st.sidebar.button("计算风险指标", type="primary"):
                     ("偏度", f"{metrics.get('skewness', 0):.3f}", "分布不对称性"),
                     ("峰度", f"{metrics.get('kurtosis', 0):.3f}", "尾部厚度"),
                     ("平均日收益", f"{metrics.get('mean_return', 0)*100:.4f}%", "日收益率均值"),
-                    ("日收益标准差", f"{metrics.get('std_return', 0)*100:.4f}%", "日收益率波动")
+                    ("日收益标准差", f"{metrics.get('std_return', 0)*100:.4f}%", "日收益率波动"),
+                    ("蒙特卡洛 VaR", f"{mc['var'][confidence_level]*100:.2f}%", f"{mc['n_paths']:,} 条路径"),
+                    ("蒙特卡洛 CVaR", f"{mc['cvar'][confidence_level]*100:.2f}%", "模拟尾部均值"),
+                    ("FHS VaR", f"{fhs[f'var_{fhs_label}']*100:.2f}%", f"预测波动 {fhs['sigma_forecast']*100:.2f}%")
                 ]
                 
-                for i in range(0, 6, 3):
+                for i in range(0, len(detail_metrics), 3):
                     cols = st.columns(3)
                     for j in range(3):
                         if i+j < len(detail_metrics):
@@ -4,6 +4,12 @@ import numpy as np
 import base64
 from datetime import datetime
 from io import BytesIO, StringIO
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from src.data_manager import data_manager
+from src.drawdown import drawdown_stats
 
 st.set_page_config(page_title="报告生成", page_icon="📋", layout="wide")
 
@@ -39,14 +45,21 @@ export_excel = st.sidebar.checkbox("Excel格式", True)
 # 生成模拟数据用于报告
 def generate_report_data():
     """生成模拟报告数据"""
+    top_performers = ["AAPL", "MSFT", "NVDA", "TSLA", "GOOGL"]
+
+    # 最大回撤按等权重组合的实际净值计算
+    panel, _ = data_manager.get_panel_data(top_performers, "1y")
+    portfolio_returns = panel['Close'].pct_change().dropna().mean(axis=1)
+    drawdown = drawdown_stats(portfolio_returns)
+
     return {
         "portfolio_value": np.random.uniform(100000, 500000),
         "annual_return": np.random.uniform(0.05, 0.25),
         "annual_volatility": np.random.uniform(0.15, 0.35),
         "sharpe_ratio": np.random.uniform(0.5, 1.5),
-        "max_drawdown": np.random.uniform(-0.2, -0.05),
+        "max_drawdown": float(drawdown.max_drawdown[0]),
         "var_95": np.random.uniform(-0.03, -0.01),
-        "top_performers": ["AAPL", "MSFT", "NVDA", "TSLA", "GOOGL"],
+        "top_performers": top_performers,
         "worst_performers": ["INTC", "PYPL", "META", "NFLX", "AMZN"],
         "recommendations": [
             ("增持", "科技板块", "行业复苏，增长潜力大"),
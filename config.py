@@ -6,6 +6,8 @@ DATA_SOURCES = {
     'fallback': 'mock',     # 备用数据源
     'cache_enabled': True,  # 启用缓存
     'cache_ttl': 86400,     # 缓存有效期(秒): 24小时
+    'memory_cache_size': 256 * 1024 * 1024,  # 内存缓存上限(字节)
+    'price_dtype': None,    # 价格精度: None 保持存储精度(零拷贝), 'float32' 内存减半
 }
 
 # API 配置
@@ -14,6 +16,9 @@ API_CONFIG = {
         'max_retries': 3,
         'retry_delay': 2,
         'timeout': 10,
+        'base_url': 'https://query1.finance.yahoo.com',
+        'max_workers': 8,   # 并发批次数
+        'batch_size': 20,   # 每批股票数
     },
     'alpha_vantage': {
         'api_key': None,  # 如果需要，可以添加 Alpha Vantage API 密钥
@@ -48,6 +53,34 @@ RISK_CONFIG = {
     'default_confidence': 0.95,
     'default_risk_free': 0.02,
     'default_window': 252,
+    'covariance_method': 'ledoit_wolf',  # 协方差估计: 'sample' / 'ewma' / 'ledoit_wolf'
+    'ewma_decay': 0.94,                  # EWMA 衰减因子 (RiskMetrics)
+}
+
+# 压力测试配置
+STRESS_CONFIG = {
+    # 股票所属行业（未列出的归入 '其他'）
+    'sectors': {
+        'AAPL': '科技', 'MSFT': '科技', 'GOOGL': '科技', 'NVDA': '科技', 'AMZN': '消费', 'TSLA': '消费',
+        'WMT': '消费', 'PG': '消费', 'JPM': '金融', 'JNJ': '医疗',
+        'SPY': '指数', 'VTI': '指数', 'QQQ': '指数', 'BTC-USD': '加密货币', 'GC=F': '商品',
+    },
+    # 历史情景：区间内各资产的实际累计收益率
+    'historical': {
+        '2022 加息周期': ('2022-01-03', '2022-10-12'),
+        '2023 硅谷银行危机': ('2023-03-08', '2023-03-17'),
+        '2024 日元套息平仓': ('2024-07-16', '2024-08-05'),
+        '2025 关税冲击': ('2025-04-02', '2025-04-08'),
+    },
+    # 假设情景：市场整体冲击，可按行业或个股覆盖（个股 > 行业 > 市场）
+    'hypothetical': {
+        '市场下跌 10%': {'market': -0.10},
+        '市场下跌 20%': {'market': -0.20},
+        '科技股抛售': {'market': -0.05, 'sectors': {'科技': -0.25}},
+        '金融危机': {'market': -0.15, 'sectors': {'金融': -0.35, '指数': -0.20}},
+        '加密货币崩盘': {'sectors': {'加密货币': -0.50}},
+        '避险行情': {'market': -0.08, 'sectors': {'商品': 0.10}},
+    },
 }
 
 # 路径配置
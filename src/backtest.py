@@ -0,0 +1,137 @@
+﻿# backtest.py - 带再平衡与交易成本的向量化组合回测
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from config import RISK_CONFIG
+from src.drawdown import drawdown_stats
+
+# 日历再平衡频率（周/月/季/年）：在每个周期的最后一个交易日再平衡
+CALENDAR_FREQS = ('W', 'M', 'Q', 'Y')
+
+def rebalance_schedule(index, rebalance):
+    """返回长度为 T 的布尔数组，标记需要按日历再平衡的交易日
+
+    rebalance 为 'W'/'M'/'Q'/'Y'（周期最后一个交易日）、整数 n（每 n 个交易日）
+    或 None（从不按日历再平衡）。
+    """
+    n_obs = len(index)
+    if rebalance is None:
+        return np.zeros(n_obs, dtype=bool)
+    if isinstance(rebalance, (int, np.integer)):
+        return (np.arange(1, n_obs + 1) % rebalance) == 0
+    if rebalance not in CALENDAR_FREQS:
+        raise ValueError(f"未知的再平衡频率: {rebalance}")
+    periods = pd.DatetimeIndex(index).to_period(rebalance).asi8
+    flags = np.zeros(n_obs, dtype=bool)
+    flags[:-1] = periods[:-1] != periods[1:]
+    return flags
+
+def make_configs(rebalance=(None, 'M', 'Q'), threshold=(None,), cost_bps=(10.0,), cash=(0.0,)):
+    """由各参数的取值生成全部组合的策略配置列表（参数扫描用）"""
+    configs = []
+    for freq, thr, cost, c in itertools.product(rebalance, threshold, cost_bps, cash):
+        name = f"{freq or '不调仓'}|阈值{thr if thr is not None else '-'}|{cost:g}bp|现金{c:.0%}"
+        configs.append({'name': name, 'rebalance': freq, 'threshold': thr, 'cost_bps': cost, 'cash': c})
+    return configs
+
+class BacktestResult:
+    """回测结果：净值、换手率、交易成本与再平衡标记均为 (T, K) 数组"""
+
+    __slots__ = ('index', 'names', 'nav', 'turnover', 'costs', 'rebalanced')
+
+    def __init__(self, index, names, nav, turnover, costs, rebalanced):
+        self.index = index
+        self.names = names
+        self.nav = nav
+        self.turnover = turnover
+        self.costs = costs
+        self.rebalanced = rebalanced
+
+    def nav_frame(self):
+        return pd.DataFrame(self.nav, index=self.index, columns=self.names)
+
+    def summary(self, periods_per_year=252):
+        """每个策略一行：收益、波动、夏普、最大回撤、年化换手、累计成本、再平衡次数"""
+        nav = self.nav
+        daily = np.vstack([nav[:1] - 1, nav[1:] / nav[:-1] - 1])
+        years = len(nav) / periods_per_year
+        annual_vol = daily.std(axis=0, ddof=1) * np.sqrt(periods_per_year)
+        annual_return = daily.mean(axis=0) * periods_per_year
+        risk_free_rate = RISK_CONFIG['default_risk_free']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sharpe = np.where(annual_vol > 0, (annual_return - risk_free_rate) / annual_vol, 0.0)
+        drawdown = drawdown_stats(daily, periods_per_year=periods_per_year)
+        return pd.DataFrame({
+            'total_return': nav[-1] - 1,
+            'cagr': drawdown.cagr,
+            'annual_volatility': annual_vol,
+            'sharpe_ratio': sharpe,
+            'max_drawdown': drawdown.max_drawdown,
+            'annual_turnover': self.turnover.sum(axis=0) / years,
+            'total_cost': self.costs.sum(axis=0),
+            'rebalances': self.rebalanced.sum(axis=0),
+        }, index=self.names)
+
+def run_backtest(returns, weights, configs, cash_rate=None):
+    """对 K 个策略配置同时回测，权重漂移递推在 (N, K) 矩阵上逐日进行
+
+    returns 为 (T, N) 日收益率 DataFrame；weights 为目标权重（长度 N 的
+    向量或 {代码: 权重}），配置中可用 'weights' 单独指定。每个配置为字典：
+      rebalance  日历再平衡频率（见 rebalance_schedule）
+      threshold  任一资产偏离目标权重超过该值时再平衡（None 为不启用）
+      cost_bps   每单位单边换手的交易成本（基点）
+      cash       持有现金的比例，按 cash_rate（默认无风险利率）计息，风险资产按 1-cash 缩放
+    期初按目标权重建仓（不计成本）；每日先按收益率漂移，收盘时对需要
+    再平衡的策略调回目标权重并扣除成本。
+    """
+    frame = returns.to_frame() if isinstance(returns, pd.Series) else returns
+    r = np.nan_to_num(frame.to_numpy(dtype=np.float64))
+    n_obs = len(r)
+    n_configs = len(configs)
+    cash_rate = RISK_CONFIG['default_risk_free'] if cash_rate is None else cash_rate
+    daily_cash = (1 + cash_rate) ** (1 / 252) - 1
+
+    def as_vector(w):
+        if isinstance(w, dict):
+            return np.array([w.get(t, 0.0) for t in frame.columns], dtype=np.float64)
+        return np.asarray(w, dtype=np.float64)
+
+    # 目标权重 (N, K)、阈值、成本与日历再平衡计划 (T, K)
+    cash = np.array([c.get('cash', 0.0) for c in configs])
+    target = np.column_stack([as_vector(c.get('weights', weights)) for c in configs])
+    target = target / target.sum(axis=0) * (1 - cash)
+    threshold = np.array([np.inf if c.get('threshold') is None else c['threshold'] for c in configs])
+    cost_rate = np.array([c.get('cost_bps', 0.0) for c in configs]) / 1e4
+    schedule = np.column_stack([rebalance_schedule(frame.index, c.get('rebalance')) for c in configs])
+
+    nav = np.empty((n_obs, n_configs))
+    turnover = np.zeros((n_obs, n_configs))
+    costs = np.zeros((n_obs, n_configs))
+    rebalanced = np.zeros((n_obs, n_configs), dtype=bool)
+
+    h = target.copy()
+    value = np.ones(n_configs)
+    for t in range(n_obs):
+        # 漂移：各资产和现金按当日收益增长，权重按组合收益重新归一
+        grown = h * (1 + r[t][:, None])
+        cash_weight = (1 - h.sum(axis=0)) * (1 + daily_cash)
+        growth = grown.sum(axis=0) + cash_weight
+        value *= growth
+        h = grown / growth
+
+        # 收盘再平衡：日历到期或偏离超过阈值
+        due = schedule[t] | (np.abs(h - target).max(axis=0) > threshold)
+        if due.any():
+            trade = np.abs(target - h).sum(axis=0) * due
+            cost = trade * cost_rate
+            value *= 1 - cost
+            h = np.where(due, target, h)
+            turnover[t] = trade
+            costs[t] = cost
+            rebalanced[t] = due
+        nav[t] = value
+
+    names = [c.get('name', str(k)) for k, c in enumerate(configs)]
+    return BacktestResult(frame.index, names, nav, turnover, costs, rebalanced)
@@ -0,0 +1,145 @@
+﻿# covariance.py - 协方差估计与带缓存的协方差服务
+import hashlib
+import threading
+
+import numpy as np
+import pandas as pd
+
+from config import RISK_CONFIG
+from src.memo_cache import MemoCache
+from src.rng import stable_seed
+
+METHODS = ('sample', 'ewma', 'ledoit_wolf')
+
+def sample_covariance(values):
+    """样本均值与协方差（ddof=1，与 DataFrame.cov 一致）"""
+    mean = values.mean(axis=0)
+    x = values - mean
+    return mean, (x.T @ x) / max(len(values) - 1, 1)
+
+def ewma_covariance(values, decay=None):
+    """RiskMetrics 式指数加权均值与协方差（零均值外积），权重之和归一为1
+
+    第 i 行（从0开始）的权重为 (1-λ)·λ^(n-1-i) / (1-λ^n)，窗口滑动时可按
+    CovarianceService 中的滑动窗口递推增量更新。
+    """
+    decay = RISK_CONFIG['ewma_decay'] if decay is None else decay
+    n = len(values)
+    weights = (1 - decay) * decay ** np.arange(n - 1, -1, -1, dtype=np.float64)
+    weights = (weights / weights.sum()).astype(values.dtype)
+    mean = weights @ values
+    return mean, (values * weights[:, None]).T @ values
+
+def ledoit_wolf(values):
+    """Ledoit-Wolf 收缩协方差：向 μI 收缩，收缩强度取渐近最优值
+
+    S 为以 1/T 归一的样本协方差，μ = tr(S)/N，
+    δ² = ||S - μI||²，β̄² = (Σ_t ||x_t||⁴ - T·||S||²) / T²，
+    收缩强度 = min(β̄², δ²) / δ²。
+    """
+    n_obs, n_cols = values.shape
+    mean = values.mean(axis=0)
+    x = values - mean
+    s = (x.T @ x) / n_obs
+    mu = np.trace(s) / n_cols
+    s_norm2 = float(np.sum(s * s, dtype=np.float64))
+    delta2 = s_norm2 - 2 * mu * np.trace(s) + mu * mu * n_cols
+    row_norm2 = np.einsum('ij,ij->i', x, x, dtype=np.float64)
+    beta2 = (float(np.sum(row_norm2 ** 2)) - n_obs * s_norm2) / n_obs ** 2
+    shrinkage = min(max(beta2, 0.0), delta2) / delta2 if delta2 > 0 else 1.0
+
+    cov = (1 - shrinkage) * s
+    cov[np.diag_indices(n_cols)] += shrinkage * mu
+    return mean, cov
+
+def universe_key(tickers):
+    """股票列表的稳定哈希（与顺序有关）"""
+    return format(stable_seed(*tickers), '032x')
+
+def content_key(values):
+    """收益率矩阵内容的哈希：列名相同（如未命名的 Series）但数据不同时不会共用缓存"""
+    values = np.ascontiguousarray(values)
+    return hashlib.blake2b(values.tobytes(), digest_size=16).hexdigest()
+
+class CovarianceService:
+    """按 (股票池哈希, 窗口, 方法, 精度) 缓存协方差估计
+
+    缓存键还包含数据最后日期和数据内容哈希，新数据到来或列名相同而数据
+    不同时不会取到错误结果。
+    EWMA 额外保存递推状态：同一股票池和窗口在新交易日到来时只对新增的
+    几行做滑动窗口更新（加入新行、移出最早的行，权重与 ewma_covariance
+    相同），不重新计算 O(T·N²)；仅当窗口长度相同且与上次重叠的各行数据
+    完全一致时才使用该状态。
+    float32 可将大股票池的内存和矩阵乘法耗时减半。
+    """
+
+    def __init__(self, memo=None):
+        self.memo = memo or MemoCache()
+        self._lock = threading.Lock()
+        self._ewma_state = {}
+
+    def get(self, returns, method=None, window=None, dtype=None, decay=None):
+        """返回 (均值向量, 协方差矩阵)，returns 为日期索引的 (T, N) DataFrame"""
+        method = method or RISK_CONFIG['covariance_method']
+        if method not in METHODS:
+            raise ValueError(f"未知的协方差估计方法: {method}")
+        window = window or RISK_CONFIG['default_window']
+        dtype = np.dtype(dtype or np.float64)
+        decay = RISK_CONFIG['ewma_decay'] if decay is None else decay
+        frame = returns.to_frame() if isinstance(returns, pd.Series) else returns
+        frame = frame.iloc[-window:]
+        values = np.nan_to_num(frame.to_numpy(dtype=dtype))
+
+        universe = universe_key(frame.columns)
+        key = ('cov', universe, window, method, dtype.str, decay if method == 'ewma' else None,
+               frame.index[-1], content_key(values))
+        return self.memo.get_or_compute(key, lambda: self._estimate(frame, values, universe, window, method, decay))
+
+    def _estimate(self, frame, values, universe, window, method, decay):
+        if method == 'ewma':
+            return self._ewma(frame.index, values, universe, window, decay)
+        if method == 'ledoit_wolf':
+            return ledoit_wolf(values)
+        return sample_covariance(values)
+
+    def _ewma(self, index, values, universe, window, decay):
+        state_key = (universe, window, values.dtype.str, decay)
+        with self._lock:
+            state = self._ewma_state.get(state_key)
+
+        resumable = False
+        if state is not None and state[0] in index and state[0] < index[-1]:
+            # 上次窗口中仍在本窗口内的行必须逐字节相同，否则是另一份数据（同名列）；
+            # 窗口长度也须相同，归一化常数 1-λ^n 才一致
+            last_date, last_index, last_values = state[:3]
+            overlap = index[index <= last_date]
+            resumable = (len(last_index) == len(index) and last_index[-len(overlap):].equals(overlap)
+                         and np.array_equal(last_values[-len(overlap):], values[:len(overlap)]))
+
+        if resumable:
+            # 滑动窗口递推：每加入一行新数据，移出窗口最早的一行
+            #   S ← λS + (1-λ)/(1-λ^n)·(r_new·r_new' - λ^n·r_drop·r_drop')
+            n = len(values)
+            n_new = n - len(overlap)
+            lam_n = decay ** n
+            scale = (1 - decay) / (1 - lam_n)
+            mean, cov = state[3].copy(), state[4].copy()
+            for r_new, r_drop in zip(values[-n_new:], last_values[:n_new]):
+                mean *= decay
+                mean += scale * (r_new - lam_n * r_drop)
+                cov *= decay
+                cov += scale * (np.outer(r_new, r_new) - lam_n * np.outer(r_drop, r_drop))
+        else:
+            mean, cov = ewma_covariance(values, decay)
+
+        with self._lock:
+            self._ewma_state[state_key] = (index[-1], index, values, mean, cov)
+        return mean, cov
+
+    def clear(self):
+        self.memo.clear()
+        with self._lock:
+            self._ewma_state.clear()
+
+# 全局协方差服务
+covariance_service = CovarianceService()
@@ -1,16 +1,43 @@
 ﻿# data_manager.py - 简化的数据管理器
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
-import os
+
+from config import DATA_SOURCES, MOCK_DATA_CONFIG
+from src.memo_cache import MemoCache
+from src.price_cache import PriceCache
+from src.price_series import PriceSeries
+from src.price_store import PriceStore
+from src.rng import make_rng
+from src.simulation import simulate_feedback_returns
+from src.yahoo_provider import YahooFinanceProvider
+
+# 周期对应的交易日数
+PERIOD_DAYS = {
+    "1mo": 30, "3mo": 90, "6mo": 180,
+    "1y": 252, "2y": 504, "5y": 1260
+}
+
+# 完整历史所用的周期，各周期的数据均从中截取
+MASTER_PERIOD = "5y"
+
+# 增量补齐时可选的数据源周期及其覆盖的交易日数（从短到长）
+DELTA_RANGES = [("5d", 5), ("1mo", 21), ("3mo", 63), ("6mo", 126), ("1y", 252), ("2y", 504)]
+
+# OHLCV 字段顺序
+OHLCV_FIELDS = ['Open', 'High', 'Low', 'Close', 'Volume']
 
 class DataManager:
     """简化的数据管理器，避免API限制"""
-    
-    def __init__(self):
+
+    def __init__(self, cache=None, store=None, memo=None, provider=None):
+        self.cache = cache if cache is not None else PriceCache()
+        self.store = store if store is not None else PriceStore()
+        self.memo = memo if memo is not None else MemoCache()
+        self.provider = provider if provider is not None else YahooFinanceProvider()
+        self.source = DATA_SOURCES['fallback'] if MOCK_DATA_CONFIG['default_source'] else DATA_SOURCES['primary']
         self.sample_stocks = {
             "AAPL": "Apple Inc.",
-            "MSFT": "Microsoft Corporation", 
+            "MSFT": "Microsoft Corporation",
             "GOOGL": "Alphabet Inc.",
             "AMZN": "Amazon.com Inc.",
             "TSLA": "Tesla Inc.",
@@ -23,61 +50,318 @@ class DataManager:
             "QQQ": "Invesco QQQ Trust",
             "VTI": "Vanguard Total Stock Market ETF"
         }
-    
-    def generate_mock_data(self, ticker, period="1y"):
-        """生成模拟股票数据"""
-        
-        # 根据周期确定天数
-        period_days = {
-            "1mo": 30, "3mo": 90, "6mo": 180,
-            "1y": 252, "2y": 504, "5y": 1260
-        }
-        days = period_days.get(period, 252)
-        
-        # 根据股票代码设置不同的参数
+
+    def _ticker_profile(self, ticker):
+        """根据股票代码返回 (最低价, 最高价, 日收益, 波动率)"""
         if ticker in ["AAPL", "MSFT", "GOOGL", "AMZN"]:
-            base_price = np.random.uniform(100, 500)
-            daily_return = 0.0005
-            volatility = 0.015
+            return 100, 500, 0.0005, 0.015
         elif ticker in ["TSLA", "NVDA"]:
-            base_price = np.random.uniform(50, 300)
-            daily_return = 0.0008
-            volatility = 0.025
+            return 50, 300, 0.0008, 0.025
         elif ticker in ["SPY", "VTI", "QQQ"]:
-            base_price = np.random.uniform(200, 500)
-            daily_return = 0.0003
-            volatility = 0.012
+            return 200, 500, 0.0003, 0.012
+        else:
+            return 50, 200, 0.0004, 0.018
+
+    def _draw_noise(self, keys, n_days):
+        """为每只股票从各自的确定性随机流中抽取噪声
+
+        keys 为每只股票的随机流键 (代码, 周期, 情景)。返回
+        (基准价均匀数, 标准正态, 均匀数, 成交量)，形状为 (天数, 股票数)。
+        每只股票的序列只取决于自己的键，与同批的其他股票无关。
+        """
+        n = len(keys)
+        base_u = np.empty(n)
+        normals = np.empty((n, 2, n_days))
+        uniforms = np.empty((n, 2, n_days))
+        volume = np.empty((n, n_days), dtype=np.int64)
+        for j, key in enumerate(keys):
+            rng = make_rng(*key)
+            base_u[j] = rng.random()
+            rng.standard_normal(out=normals[j])
+            rng.random(out=uniforms[j])
+            volume[j] = rng.integers(1000000, 10000000, n_days)
+        return base_u, normals.transpose(1, 2, 0), uniforms.transpose(1, 2, 0), volume.T
+
+    def _simulate_panel(self, tickers, dates, keys, prev_close=None):
+        """按给定日期生成OHLCV面板；prev_close 给定时从该收盘价接续生成"""
+        shape = (len(dates), len(tickers))
+
+        # 每只股票的参数向量
+        profiles = np.array([self._ticker_profile(t) for t in tickers], dtype=float).reshape(-1, 4)
+        low, high, daily_return, volatility = profiles.T
+        base_u, normals, uniforms, volume = self._draw_noise(keys, shape[0])
+        if prev_close is None:
+            base_price = low + (high - low) * base_u
+        else:
+            base_price = np.asarray(prev_close, dtype=float)
+
+        # 生成价格矩阵
+        returns = daily_return + volatility * normals[0]
+        close = base_price * np.exp(np.cumsum(returns, axis=0))
+
+        # 开盘价为前一日收盘价加微小扰动，首日沿用次日开盘价（接续生成时用上一收盘价）
+        open_ = np.empty(shape)
+        open_[1:] = close[:-1] * (1 + 0.001 * normals[1][1:])
+        if prev_close is not None:
+            open_[:1] = base_price * (1 + 0.001 * normals[1][:1])
+        else:
+            open_[:1] = open_[1:2] if shape[0] > 1 else close[:1]
+
+        high_price = np.maximum(open_, close) * (1 + 0.02 * uniforms[0])
+        low_price = np.minimum(open_, close) * (1 - 0.02 * uniforms[1])
+
+        fields = dict(zip(OHLCV_FIELDS, [open_, high_price, low_price, close, volume]))
+        return pd.concat(
+            {name: pd.DataFrame(values, index=dates, columns=tickers) for name, values in fields.items()},
+            axis=1
+        )
+
+    def generate_mock_panel(self, tickers, period="1y", scenario="base"):
+        """批量生成多只股票的模拟OHLCV面板
+
+        所有股票的收益率组成一个 (天数, 股票数) 的矩阵，
+        Open/High/Low/Volume 均以数组方式推导。返回的DataFrame列为
+        (字段, 股票代码) 两级索引，例如 panel['Close'] 为收盘价矩阵。
+        随机数按 (代码, 周期, 情景) 确定，同样的请求总是得到同样的数据。
+        """
+        tickers = list(tickers)
+        days = PERIOD_DAYS.get(period, 252)
+        dates = pd.date_range(end=pd.Timestamp.now().normalize(), periods=days, freq='B')
+        return self._simulate_panel(tickers, dates, [(t, period, scenario) for t in tickers])
+
+    def generate_mock_delta(self, ticker, last_date, last_close, end=None):
+        """从最后一根K线之后接续生成模拟数据（截至 end，默认今天）
+
+        随机流以 (代码, 最后日期) 为键，同一次补齐在任何进程中结果相同。
+        """
+        end = pd.Timestamp(end) if end is not None else pd.Timestamp.now()
+        dates = pd.bdate_range(pd.Timestamp(last_date) + pd.offsets.BDay(1), end.normalize())
+        keys = [(ticker, pd.Timestamp(last_date).strftime('%Y-%m-%d'), "delta")]
+        panel = self._simulate_panel([ticker], dates, keys, prev_close=[last_close])
+        return panel.xs(ticker, axis=1, level=1)
+
+    def generate_mock_data(self, ticker, period="1y", scenario="base"):
+        """生成模拟股票数据"""
+        panel = self.generate_mock_panel([ticker], period, scenario)
+        return panel.xs(ticker, axis=1, level=1)
+
+    def _fetch_histories(self, tickers):
+        """从数据源获取完整历史，获取失败的代码逐个降级为模拟数据"""
+        histories = {}
+        if self.source != DATA_SOURCES['fallback']:
+            fetched, _ = self.provider.fetch_many(tickers, MASTER_PERIOD)
+            histories = {t: (data, self.source) for t, data in fetched.items()}
+
+        missing = [t for t in tickers if t not in histories]
+        if missing:
+            panel = self.generate_mock_panel(missing, MASTER_PERIOD)
+            for ticker in missing:
+                histories[ticker] = panel.xs(ticker, axis=1, level=1), DATA_SOURCES['fallback']
+        return histories
+
+    def _load_histories(self, tickers):
+        """批量加载完整历史：内存映射存储 → Parquet缓存 → 数据源/模拟数据"""
+        histories = {}
+        to_store, to_fetch = [], []
+        if self.cache.enabled:
+            # 已存储但过期的股票只补齐缺失的K线
+            stale = [t for t in tickers if self.store.has(t) and not self.store.is_fresh(t, self.cache.ttl)]
+            if stale:
+                self._append_deltas(stale)
+
+        for ticker in tickers:
+            if self.cache.enabled and self.store.is_fresh(ticker, self.cache.ttl):
+                stored = self.store.read(ticker)
+                if stored is not None:
+                    histories[ticker] = stored
+                    continue
+
+            to_store.append(ticker)
+            cached = self.cache.get(ticker, MASTER_PERIOD)
+            if cached is not None:
+                histories[ticker] = cached
+            else:
+                to_fetch.append(ticker)
+
+        if to_fetch:
+            for ticker, history in self._fetch_histories(to_fetch).items():
+                self.cache.put(ticker, MASTER_PERIOD, *history)
+                histories[ticker] = history
+
+        # 新加载的历史写入内存映射存储，之后以映射视图返回
+        if self.cache.enabled:
+            for ticker in to_store:
+                try:
+                    self.store.write(ticker, *histories[ticker])
+                except OSError:
+                    continue
+                stored = self.store.read(ticker)
+                if stored is not None:
+                    histories[ticker] = stored
+        return histories
+
+    def _append_deltas(self, tickers):
+        """为已存储的股票补齐最后一根K线之后的数据，返回 {代码: 新增行数}"""
+        today = pd.Timestamp.now().normalize()
+        last_bars = {}
+        for ticker in tickers:
+            result = self.store.read_arrays(ticker)
+            if result is not None:
+                arrays = result[0]
+                last_bars[ticker] = pd.Timestamp(int(arrays['dates'][-1])), float(arrays['Close'][-1])
+
+        gaps = {
+            t: len(pd.bdate_range(last_date + pd.offsets.BDay(1), today))
+            for t, (last_date, _) in last_bars.items() if last_date < today
+        }
+        gaps = {t: gap for t, gap in gaps.items() if gap > 0}
+
+        deltas = {}
+        if gaps and self.source != DATA_SOURCES['fallback']:
+            # 按最大缺口选择能覆盖的最短周期，批量获取
+            max_gap = max(gaps.values())
+            period = next((p for p, days in DELTA_RANGES if max_gap <= days), MASTER_PERIOD)
+            fetched, _ = self.provider.fetch_many(list(gaps), period)
+            deltas = {t: (data, self.source) for t, data in fetched.items()}
+
+        for ticker in gaps:
+            if ticker not in deltas:
+                last_date, last_close = last_bars[ticker]
+                deltas[ticker] = self.generate_mock_delta(ticker, last_date, last_close), DATA_SOURCES['fallback']
+
+        added = {}
+        for ticker in last_bars:
+            if ticker in deltas:
+                added[ticker] = self.store.append(ticker, *deltas[ticker])
+            else:
+                self.store.touch(ticker)
+                added[ticker] = 0
+        return added
+
+    def refresh(self, tickers=None):
+        """增量刷新：已存储的股票只获取/生成缺失的K线，未存储的完整加载
+
+        tickers 默认为存储中的全部股票。返回 {代码: 新增行数}。
+        """
+        tickers = list(tickers) if tickers is not None else self.store.tickers()
+        stored = [t for t in tickers if self.store.has(t)]
+        added = self._append_deltas(stored)
+
+        missing = [t for t in tickers if t not in added]
+        if missing:
+            for ticker, (data, _) in self._load_histories(missing).items():
+                added[ticker] = len(data)
+
+        self.memo.clear()
+        return added
+
+    def get_history_state(self, ticker):
+        """已存储历史的派生状态：累计收益、运行最高价、当前回撤和最大回撤"""
+        return self.store.state(ticker)
+
+    def _load_history(self, ticker):
+        """加载单只股票的完整历史"""
+        return self._load_histories([ticker])[ticker]
+
+    def _returns_profile(self, ticker):
+        """收益率模拟参数 (均值, 波动率)"""
+        if "SPY" in ticker or "VTI" in ticker:
+            return 0.0003, 0.01
+        elif "AAPL" in ticker or "MSFT" in ticker:
+            return 0.0005, 0.015
+        elif "TSLA" in ticker or "NVDA" in ticker:
+            return 0.0008, 0.025
         else:
-            base_price = np.random.uniform(50, 200)
-            daily_return = 0.0004
-            volatility = 0.018
-        
-        # 生成日期序列
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days)
-        dates = pd.date_range(start=start_date, end=end_date, freq='B')[:days]
-        
-        # 生成价格序列
-        n = len(dates)
-        returns = np.random.normal(daily_return, volatility, n)
-        prices = base_price * np.exp(np.cumsum(returns))
-        
-        # 创建DataFrame
-        data = pd.DataFrame(index=dates[:len(prices)])
-        data['Close'] = prices
-        data['Open'] = data['Close'].shift(1) * (1 + np.random.normal(0, 0.001, len(data)))
-        data['High'] = data[['Open', 'Close']].max(axis=1) * (1 + np.random.uniform(0, 0.02, len(data)))
-        data['Low'] = data[['Open', 'Close']].min(axis=1) * (1 - np.random.uniform(0, 0.02, len(data)))
-        data['Volume'] = np.random.randint(1000000, 10000000, len(data))
-        
-        # 填充NaN值
-        data = data.ffill().bfill()
-        
-        return data
-    
-    def get_stock_data(self, ticker, period="1y"):
-        """获取股票数据（总是返回模拟数据）"""
-        return self.generate_mock_data(ticker, period), "mock"
+            return 0.0004, 0.018
+
+    def generate_mock_returns(self, ticker, days=252):
+        """生成带自相关、波动聚集和极端事件的模拟日收益率"""
+        rng = make_rng(ticker, days, "returns")
+        mu, sigma = self._returns_profile(ticker)
+
+        # 生成收益率序列（一次抽取全部噪声，与逐日 rng.normal 的随机流一致）
+        returns = simulate_feedback_returns(mu, sigma, rng.standard_normal(days))
+
+        # 添加一些极端事件
+        extreme_days = rng.choice(days, size=max(1, days//50), replace=False)
+        returns[extreme_days] *= rng.choice([-2, 2], size=len(extreme_days))
+
+        return pd.Series(returns, index=pd.date_range(end=pd.Timestamp.now().normalize(), periods=days, freq='B'))
+
+    def _slice_rows(self, dates, period=None, start=None, end=None):
+        """在已排序的日期（int64 纳秒）上确定切片范围
+
+        给定 start/end 时按日期二分查找（O(log n)），否则按周期取最近的N个交易日。
+        """
+        if start is None and end is None:
+            return slice(-PERIOD_DAYS.get(period or "1y", 252), None)
+        lo = np.searchsorted(dates, pd.Timestamp(start).value, side='left') if start is not None else 0
+        hi = np.searchsorted(dates, pd.Timestamp(end).value, side='right') if end is not None else len(dates)
+        return slice(int(lo), int(hi))
+
+    def get_price_series(self, ticker, period="1y", start=None, end=None, dtype=None):
+        """获取紧凑的 PriceSeries（存储命中且不转换精度时为内存映射视图）
+
+        每只股票只缓存一条完整历史，不同周期或 start/end 日期范围都是
+        在其上的切片视图，因此切换周期不会重新生成，且各周期的数据一致。
+        dtype 默认取 DATA_SOURCES['price_dtype']，为 None 时保持存储精度。
+        """
+        dtype = dtype or DATA_SOURCES['price_dtype']
+
+        def load():
+            data, source = self._load_history(ticker)
+            return PriceSeries.from_frame(ticker, data, source, dtype=dtype)
+
+        master = self.memo.get_or_compute(('series', ticker, self.source, dtype), load)
+        return master[self._slice_rows(master.dates, period, start, end)]
+
+    async def get_price_series_async(self, ticker, period="1y", start=None, end=None, dtype=None):
+        """get_price_series 的协程版本，与其他会话的同一请求共享一次加载"""
+        dtype = dtype or DATA_SOURCES['price_dtype']
+
+        def load():
+            data, source = self._load_history(ticker)
+            return PriceSeries.from_frame(ticker, data, source, dtype=dtype)
+
+        master = await self.memo.get_or_compute_async(('series', ticker, self.source, dtype), load)
+        return master[self._slice_rows(master.dates, period, start, end)]
+
+    def get_stock_data(self, ticker, period="1y", start=None, end=None):
+        """获取股票数据 DataFrame（由 PriceSeries 转换，列引用同一组数组）"""
+        series = self.get_price_series(ticker, period, start, end)
+        return series.to_frame(), series.source
+
+    def get_panel_data(self, tickers, period="1y", start=None, end=None):
+        """批量获取多只股票数据，返回 (字段, 股票代码) 两级列的面板
+
+        与 get_stock_data 走同一条加载路径（内存映射存储 → Parquet缓存 →
+        数据源/模拟数据，过期时增量补齐），因此面板中的序列与同一只股票的
+        get_stock_data 一致；未存储的股票批量获取或整块模拟，再按日期对齐。
+        与 get_price_series 相同，只缓存完整历史，周期和日期范围为切片。
+        """
+        tickers = tuple(tickers)
+
+        def load():
+            histories = self._load_histories(tickers)
+            panel = pd.concat({t: histories[t][0] for t in tickers}, axis=1).swaplevel(axis=1)
+            panel = panel[OHLCV_FIELDS].reindex(columns=list(tickers), level=1)
+            sources = {histories[t][1] for t in tickers}
+            return panel, sources.pop() if len(sources) == 1 else "mixed"
+
+        panel, source = self.memo.get_or_compute(('panel', tickers, self.source), load)
+        dates = panel.index.values.astype('datetime64[ns]').view(np.int64)
+        return panel.iloc[self._slice_rows(dates, period, start, end)], source
+
+    def get_returns_data(self, ticker, days=252):
+        """获取模拟日收益率序列"""
+        return self.memo.get_or_compute(
+            ('returns', ticker, days, self.source),
+            lambda: self.generate_mock_returns(ticker, days)
+        )
+
+    def cache_stats(self):
+        """内存缓存的命中统计，以及并发请求被合并（coalesced）的次数"""
+        return self.memo.stats()
 
 # 创建全局实例
 data_manager = DataManager()
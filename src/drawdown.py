@@ -0,0 +1,163 @@
+﻿# drawdown.py - 多序列回撤分析
+import numpy as np
+import pandas as pd
+
+class DrawdownStats:
+    """(T, N) 收益率矩阵的回撤分析结果，各指标以长度为 N 的数组保存
+
+    位置均为行下标（-1 表示尚未恢复）；top-k 回撤区间为 (N, k) 数组，
+    按深度从大到小排列，不足 k 个时深度为0、位置为-1。
+    只在展示时通过 summary() / episodes() 转换为 DataFrame。
+    """
+
+    __slots__ = ('columns', 'dates', 'max_drawdown', 'peak', 'trough', 'recovery', 'duration',
+                 'time_under_water', 'current_drawdown', 'cagr', 'calmar',
+                 'episode_depth', 'episode_peak', 'episode_trough', 'episode_recovery')
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields[name])
+
+    def _date(self, pos):
+        return self.dates[pos] if self.dates is not None and pos >= 0 else None
+
+    def summary(self):
+        """每列一行的汇总表（日期列在有日期索引时给出）"""
+        frame = pd.DataFrame({
+            'max_drawdown': self.max_drawdown,
+            'peak_date': [self._date(p) for p in self.peak],
+            'trough_date': [self._date(p) for p in self.trough],
+            'recovery_date': [self._date(p) for p in self.recovery],
+            'duration': self.duration,
+            'time_under_water': self.time_under_water,
+            'current_drawdown': self.current_drawdown,
+            'cagr': self.cagr,
+            'calmar_ratio': self.calmar,
+        }, index=self.columns)
+        return frame
+
+    def episodes(self, column=0):
+        """某一列的 top-k 回撤区间（column 为列名或位置）"""
+        j = column if isinstance(column, (int, np.integer)) else list(self.columns).index(column)
+        found = self.episode_peak[j] >= 0
+        return pd.DataFrame({
+            'depth': self.episode_depth[j][found],
+            'peak_date': [self._date(p) for p in self.episode_peak[j][found]],
+            'trough_date': [self._date(p) for p in self.episode_trough[j][found]],
+            'recovery_date': [self._date(p) for p in self.episode_recovery[j][found]],
+        })
+
+def _empty_stats(columns, dates, n_cols):
+    """不足两个观测值时的结果：无回撤区间，收益类指标为 NaN"""
+    none = np.full(n_cols, -1)
+    empty = np.empty((n_cols, 0))
+    return DrawdownStats(
+        columns=columns,
+        dates=dates,
+        max_drawdown=np.zeros(n_cols),
+        peak=none,
+        trough=none,
+        recovery=none,
+        duration=np.zeros(n_cols, dtype=np.int64),
+        time_under_water=np.zeros(n_cols),
+        current_drawdown=np.zeros(n_cols),
+        cagr=np.full(n_cols, np.nan),
+        calmar=np.full(n_cols, np.nan),
+        episode_depth=empty,
+        episode_peak=empty.astype(np.int64),
+        episode_trough=empty.astype(np.int64),
+        episode_recovery=empty.astype(np.int64),
+    )
+
+def drawdown_stats(returns, top_k=5, periods_per_year=252):
+    """一次线性扫描计算每列的回撤指标
+
+    returns 为 Series、(T, N) DataFrame 或数组。净值从1开始按 (1+r) 累乘，
+    峰值为已出现净值的累计最大值（与投资组合页的 cummax 口径一致）。
+    每个回撤区间以峰值所在行标识：区间从峰值开始，至净值重新达到
+    峰值（恢复）的前一行结束。各区间的深度、谷底与结束位置用分组
+    归约（ufunc.at）一次求出，复杂度与 T×N 成线性。
+
+    top-k 区间用 argpartition 选出后只对这 k 个排序，为 O(T + k log k)。
+    Calmar 比率为年化复合收益率除以最大回撤的绝对值。
+    不足两个观测值时没有回撤，返回空结果（区间数组为 (N, 0)）。
+    """
+    if isinstance(returns, pd.Series):
+        returns = returns.to_frame()
+    if isinstance(returns, pd.DataFrame):
+        columns, dates = returns.columns, returns.index
+        values = returns.to_numpy(dtype=np.float64)
+    else:
+        values = np.asarray(returns, dtype=np.float64)
+        values = values[:, None] if values.ndim == 1 else values
+        columns, dates = pd.RangeIndex(values.shape[1]), None
+    values = np.nan_to_num(values)
+    n_obs, n_cols = values.shape
+    if n_obs < 2:
+        return _empty_stats(columns, dates, n_cols)
+
+    wealth = np.cumprod(1 + values, axis=0)
+    peak_value = np.maximum.accumulate(wealth, axis=0)
+    dd = wealth / peak_value - 1
+    rows = np.arange(n_obs)[:, None]
+    # 每一行所属回撤区间的峰值位置
+    peak_pos = np.maximum.accumulate(np.where(wealth >= peak_value, rows, 0), axis=0)
+
+    # 按 (列, 峰值位置) 分组归约：深度、谷底位置、区间最后一行
+    key = (peak_pos + np.arange(n_cols) * n_obs).ravel(order='F')
+    dd_flat = dd.ravel(order='F')
+    t_flat = np.tile(np.arange(n_obs), n_cols)
+    depth = np.zeros(n_obs * n_cols)
+    np.minimum.at(depth, key, dd_flat)
+    at_trough = (dd_flat == depth[key]) & (dd_flat < 0)
+    trough_pos = np.full(n_obs * n_cols, n_obs)
+    np.minimum.at(trough_pos, key[at_trough], t_flat[at_trough])
+    last_pos = np.full(n_obs * n_cols, -1)
+    np.maximum.at(last_pos, key, t_flat)
+
+    depth = depth.reshape(n_cols, n_obs)
+    trough_pos = trough_pos.reshape(n_cols, n_obs)
+    last_pos = last_pos.reshape(n_cols, n_obs)
+    # 区间结束后的一行即恢复位置（等于 T 表示尚未恢复）
+    recovery_pos = np.where(last_pos + 1 < n_obs, last_pos + 1, -1)
+
+    # top-k 回撤区间：先选出最深的 k 个，再只对它们按 (深度, 峰值位置) 排序
+    k = max(1, min(top_k, n_obs))
+    order = np.argpartition(depth, k - 1, axis=1)[:, :k] if k < n_obs else np.tile(np.arange(n_obs), (n_cols, 1))
+    selected = np.take_along_axis(depth, order, axis=1)
+    order = np.take_along_axis(order, np.lexsort((order, selected), axis=1), axis=1)
+    episode_depth = np.take_along_axis(depth, order, axis=1)
+    valid = episode_depth < 0
+    episode_peak = np.where(valid, order, -1)
+    episode_trough = np.where(valid, np.take_along_axis(trough_pos, order, axis=1), -1)
+    episode_recovery = np.where(valid, np.take_along_axis(recovery_pos, order, axis=1), -1)
+
+    # 最大回撤即最深的区间
+    has_dd = valid[:, 0]
+    peak = episode_peak[:, 0]
+    recovery = episode_recovery[:, 0]
+    duration = np.where(has_dd, np.where(recovery >= 0, recovery, n_obs - 1) - peak, 0)
+
+    years = n_obs / periods_per_year
+    cagr = wealth[-1] ** (1 / years) - 1 if n_obs else np.zeros(n_cols)
+    max_drawdown = episode_depth[:, 0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        calmar = np.where(max_drawdown < 0, cagr / -max_drawdown, np.nan)
+
+    return DrawdownStats(
+        columns=columns,
+        dates=dates,
+        max_drawdown=max_drawdown,
+        peak=peak,
+        trough=episode_trough[:, 0],
+        recovery=recovery,
+        duration=duration,
+        time_under_water=(dd < 0).mean(axis=0),
+        current_drawdown=dd[-1],
+        cagr=cagr,
+        calmar=calmar,
+        episode_depth=episode_depth,
+        episode_peak=episode_peak,
+        episode_trough=episode_trough,
+        episode_recovery=episode_recovery,
+    )
@@ -0,0 +1,188 @@
+﻿# garch.py - 批量 GARCH(1,1) 拟合与过滤历史模拟 (FHS) VaR
+import threading
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import minimize
+
+from config import RISK_CONFIG
+from src.covariance import content_key
+
+# 初始参数（持续性 alpha+beta 与 alpha 占比），无缓存可热启动时使用
+INIT_PERSISTENCE = 0.97
+INIT_ALPHA_SHARE = 0.08
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+def _logit(p):
+    return np.log(p / (1.0 - p))
+
+def _unpack(theta):
+    """无约束参数 (a, b) -> 标准化尺度下的 (omega, alpha, beta)
+
+    持续性 p = sigmoid(a)，alpha = p·sigmoid(b)，beta = p - alpha；
+    方差目标法 omega = 1 - p 使无条件方差为1（收益率已按列标准化）。
+    保证 omega > 0、alpha, beta >= 0 且 alpha + beta < 1。
+    """
+    a, b = theta
+    p, q = _sigmoid(a), _sigmoid(b)
+    return 1.0 - p, p * q, p * (1.0 - q), p, q
+
+def _variance_path(z, omega, alpha, beta):
+    """条件方差序列，z 为 (T, N) 标准化收益率，逐日递推对所有列向量化"""
+    sigma2 = np.empty_like(z)
+    sigma2[0] = 1.0
+    for t in range(1, len(z)):
+        sigma2[t] = omega + alpha * z[t - 1] ** 2 + beta * sigma2[t - 1]
+    return sigma2
+
+def _nll_and_grad(theta, z):
+    """所有列的负对数似然之和及其对 (a, b) 的解析梯度
+
+    各列的似然互相独立，因此整体最小化与逐列拟合等价，
+    一次递推即可得到所有列的函数值和梯度。
+    """
+    n_cols = z.shape[1]
+    theta = theta.reshape(2, n_cols)
+    omega, alpha, beta, p, q = _unpack(theta)
+
+    sq = z * z
+    s2 = 1.0
+    d_omega = d_alpha = d_beta = np.zeros(n_cols)
+    nll = 0.5 * sq[0]
+    g_omega = g_alpha = g_beta = np.zeros(n_cols)
+    for t in range(1, len(z)):
+        # 条件方差对 (omega, alpha, beta) 的导数同样按递推更新
+        d_omega = 1.0 + beta * d_omega
+        d_alpha = sq[t - 1] + beta * d_alpha
+        d_beta = s2 + beta * d_beta
+        s2 = omega + alpha * sq[t - 1] + beta * s2
+        nll = nll + 0.5 * (np.log(s2) + sq[t] / s2)
+        w = 0.5 * (1.0 / s2 - sq[t] / (s2 * s2))
+        g_omega = g_omega + w * d_omega
+        g_alpha = g_alpha + w * d_alpha
+        g_beta = g_beta + w * d_beta
+
+    dp = p * (1.0 - p)
+    dq = q * (1.0 - q)
+    grad_a = -dp * g_omega + q * dp * g_alpha + (1.0 - q) * dp * g_beta
+    grad_b = p * dq * g_alpha - p * dq * g_beta
+    return float(nll.sum()), np.concatenate([grad_a, grad_b])
+
+def fit_garch(returns, init=None, maxiter=200):
+    """对 (T, N) 收益率的每一列拟合 GARCH(1,1)，所有列在一次优化中同时求解
+
+    收益率先按列去均值、标准化，再用方差目标法只估计 alpha、beta；
+    init 为上次拟合结果（与本函数返回格式相同的 DataFrame）时作为热启动。
+    缺失值按0处理。返回以资产为行的 DataFrame：
+    mean、omega、alpha、beta（原始收益率尺度）及最后一日的条件波动率 sigma。
+    """
+    frame = returns.to_frame() if isinstance(returns, pd.Series) else returns
+    values = frame.to_numpy(dtype=np.float64)
+    mean = np.nanmean(values, axis=0)
+    scale = np.nanstd(values, axis=0)
+    scale = np.where(scale > 0, scale, 1.0)
+    z = np.nan_to_num((values - mean) / scale)
+    n_cols = z.shape[1]
+
+    persistence = np.full(n_cols, INIT_PERSISTENCE)
+    share = np.full(n_cols, INIT_ALPHA_SHARE)
+    if init is not None:
+        prev = init.reindex(frame.columns)
+        known = prev['alpha'].notna().to_numpy()
+        p0 = (prev['alpha'] + prev['beta']).to_numpy()
+        persistence[known] = np.clip(p0[known], 1e-4, 1 - 1e-4)
+        share[known] = np.clip(prev['alpha'].to_numpy()[known] / persistence[known], 1e-4, 1 - 1e-4)
+    theta0 = np.concatenate([_logit(persistence), _logit(share)])
+
+    result = minimize(_nll_and_grad, theta0, args=(z,), jac=True, method='L-BFGS-B',
+                      options={'maxiter': maxiter})
+    omega, alpha, beta, _, _ = _unpack(result.x.reshape(2, n_cols))
+
+    sigma2 = _variance_path(z, omega, alpha, beta)
+    return pd.DataFrame({
+        'mean': mean,
+        'omega': omega * scale ** 2,
+        'alpha': alpha,
+        'beta': beta,
+        'sigma': np.sqrt(sigma2[-1]) * scale,
+    }, index=frame.columns)
+
+class GarchParamCache:
+    """按 (代码, 窗口) 缓存 GARCH 参数及拟合所用数据的最后日期和内容哈希
+
+    窗口内数据完全相同（最后日期与内容哈希都一致）时直接复用参数；
+    有新数据、数据被修正或同名的另一序列时以缓存参数热启动重新拟合，
+    通常只需少量迭代。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._params = {}
+
+    def fit(self, returns, window=None):
+        """拟合 (T, N) 收益率最近 window 天的 GARCH 参数，返回 fit_garch 格式的 DataFrame"""
+        window = window or RISK_CONFIG['default_window']
+        frame = returns.to_frame() if isinstance(returns, pd.Series) else returns
+        frame = frame.iloc[-window:]
+        last_date = frame.index[-1]
+        digests = {t: content_key(frame[t].to_numpy(dtype=np.float64)) for t in frame.columns}
+
+        with self._lock:
+            cached = {t: self._params.get((t, window)) for t in frame.columns}
+        fresh = [t for t, c in cached.items() if c is not None and c[:2] == (last_date, digests[t])]
+        stale = [t for t in frame.columns if t not in fresh]
+
+        parts = []
+        if fresh:
+            parts.append(pd.DataFrame([cached[t][2] for t in fresh], index=fresh))
+        if stale:
+            warm = [cached[t][2] for t in stale if cached[t] is not None]
+            init = pd.DataFrame(warm, index=[t for t in stale if cached[t] is not None]) if warm else None
+            fitted = fit_garch(frame[stale], init=init)
+            with self._lock:
+                for ticker, row in fitted.iterrows():
+                    self._params[(ticker, window)] = (last_date, digests[ticker], row)
+            parts.append(fitted)
+        return pd.concat(parts).reindex(frame.columns)
+
+    def clear(self):
+        with self._lock:
+            self._params.clear()
+
+# 全局参数缓存
+garch_cache = GarchParamCache()
+
+def fhs_var(returns, confidence_levels=(0.95,), window=None, params=None):
+    """过滤历史模拟 (FHS) 的一日 VaR / CVaR，对 (T, N) 收益率各列同时计算
+
+    用 GARCH(1,1) 的条件波动率标准化窗口内的历史残差，再按下一日的
+    预测波动率重新缩放得到模拟收益率，VaR/CVaR 的口径与
+    calculate_risk_metrics 相同。params 为空时经 garch_cache 拟合（带缓存）。
+
+    返回以资产为行的 DataFrame：sigma_forecast 以及每个置信水平的 var_95 / cvar_95 等。
+    """
+    window = window or RISK_CONFIG['default_window']
+    frame = returns.to_frame() if isinstance(returns, pd.Series) else returns
+    frame = frame.iloc[-window:]
+    params = garch_cache.fit(frame, window) if params is None else params.reindex(frame.columns)
+
+    values = np.nan_to_num(frame.to_numpy(dtype=np.float64) - params['mean'].to_numpy())
+    omega, alpha, beta = (params[k].to_numpy() for k in ('omega', 'alpha', 'beta'))
+    sigma2 = np.empty_like(values)
+    sigma2[0] = omega / np.maximum(1 - alpha - beta, 1e-12)
+    for t in range(1, len(values)):
+        sigma2[t] = omega + alpha * values[t - 1] ** 2 + beta * sigma2[t - 1]
+    residuals = values / np.sqrt(sigma2)
+    forecast = np.sqrt(omega + alpha * values[-1] ** 2 + beta * sigma2[-1])
+
+    simulated = params['mean'].to_numpy() + forecast * residuals
+    result = {'sigma_forecast': forecast}
+    for level in np.atleast_1d(confidence_levels):
+        var = np.percentile(simulated, (1 - level) * 100, axis=0)
+        tail = simulated <= var
+        label = f"{level * 100:g}"
+        result[f'var_{label}'] = var
+        result[f'cvar_{label}'] = (simulated * tail).sum(axis=0) / np.maximum(tail.sum(axis=0), 1)
+    return pd.DataFrame(result, index=frame.columns)
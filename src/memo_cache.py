@@ -0,0 +1,100 @@
+﻿# memo_cache.py - 进程内TTL/LRU结果缓存
+import threading
+
+from cachetools import TTLCache
+
+from config import DATA_SOURCES
+from src.single_flight import SingleFlight
+
+_MISSING = object()
+
+def _sizeof(value):
+    """估算缓存值占用的字节数（DataFrame/Series/数组按实际数据大小计）"""
+    if isinstance(value, tuple):
+        return sum(_sizeof(item) for item in value)
+    if hasattr(value, 'memory_usage'):
+        usage = value.memory_usage(index=True)
+        return int(usage.sum()) if hasattr(usage, 'sum') else int(usage)
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    return 1
+
+class MemoCache:
+    """按字节数限制大小、按TTL过期的内存缓存，并记录命中/未命中次数
+
+    超出上限时淘汰最久未使用的条目；单个值大于上限时不缓存。
+    cachetools 本身不是线程安全的，所有访问都在锁内进行，
+    计算过程本身在锁外执行。未命中时经 SingleFlight 合并：
+    多个会话同时请求同一个键只计算一次，结果写入缓存后才释放该键。
+    """
+
+    def __init__(self, maxsize=None, ttl=None):
+        maxsize = DATA_SOURCES['memory_cache_size'] if maxsize is None else maxsize
+        ttl = DATA_SOURCES['cache_ttl'] if ttl is None else ttl
+        self._cache = TTLCache(maxsize, ttl, getsizeof=_sizeof)
+        self._lock = threading.Lock()
+        self.flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, key):
+        """查找缓存并计数，未命中时返回 _MISSING"""
+        with self._lock:
+            try:
+                value = self._cache[key]
+            except KeyError:
+                self.misses += 1
+                return _MISSING
+            self.hits += 1
+            return value
+
+    def get_or_compute(self, key, compute):
+        """命中时返回缓存值，否则调用 compute() 并缓存结果"""
+        value = self._lookup(key)
+        if value is not _MISSING:
+            return value
+        return self.flight.do(key, lambda: self._compute_and_store(key, compute))
+
+    async def get_or_compute_async(self, key, compute):
+        """get_or_compute 的协程版本，计算在线程池中执行"""
+        value = self._lookup(key)
+        if value is not _MISSING:
+            return value
+        return await self.flight.do_async(key, lambda: self._compute_and_store(key, compute))
+
+    def _compute_and_store(self, key, compute):
+        # 合并窗口内先到的请求可能已经写入缓存
+        with self._lock:
+            if key in self._cache:
+                return self._cache[key]
+
+        value = compute()
+        with self._lock:
+            try:
+                self._cache[key] = value
+            except ValueError:
+                pass  # 值超过缓存上限
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._cache.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self):
+        """返回命中统计及合并统计（executions 为实际计算次数，coalesced 为被合并的请求数）"""
+        flight = self.flight.stats()
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'entries': len(self._cache),
+                'bytes': self._cache.currsize,
+                'max_bytes': self._cache.maxsize,
+                **flight,
+            }
@@ -0,0 +1,180 @@
+﻿# monte_carlo.py - 分块并行的蒙特卡洛 VaR 引擎
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.covariance import covariance_service
+
+# 每个任务块的路径数（任务划分与进程数无关，保证结果可复现）
+BLOCK_PATHS = 250_000
+# 块内每次生成的路径数，决定单次抽样的内存峰值
+CHUNK_PATHS = 50_000
+# 直方图累加器的桶数及覆盖范围（组合收益标准差的倍数）
+HIST_BINS = 1 << 18
+HIST_RANGE_SD = 40.0
+
+class TailAccumulator:
+    """流式分位数与尾部均值累加器
+
+    在固定边界的细分直方图上累计每个桶的计数和数值之和，范围外的
+    值计入两端的溢出桶（同样记录和）。内存与路径数无关，多个累加器
+    可直接相加合并。分位数在桶内线性插值，结果落在目标位置两侧的次序
+    统计量之间（各放宽一个桶宽）。
+    """
+
+    def __init__(self, low, high, bins=HIST_BINS):
+        self.low = float(low)
+        self.high = float(high)
+        self.bins = bins
+        self.width = (self.high - self.low) / bins
+        # 第0个和最后一个为下溢/上溢桶
+        self.counts = np.zeros(bins + 2, dtype=np.int64)
+        self.sums = np.zeros(bins + 2)
+        self.minimum = np.inf
+        self.total = 0
+        self.total_sum = 0.0
+        self.total_sq = 0.0
+
+    def add(self, values):
+        idx = np.floor((values - self.low) / self.width).astype(np.int64) + 1
+        np.clip(idx, 0, self.bins + 1, out=idx)
+        self.counts += np.bincount(idx, minlength=self.bins + 2)
+        self.sums += np.bincount(idx, weights=values, minlength=self.bins + 2)
+        self.minimum = min(self.minimum, float(values.min()))
+        self.total += len(values)
+        self.total_sum += float(values.sum())
+        self.total_sq += float(np.dot(values, values))
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.sums += other.sums
+        self.minimum = min(self.minimum, other.minimum)
+        self.total += other.total
+        self.total_sum += other.total_sum
+        self.total_sq += other.total_sq
+        return self
+
+    def quantile_and_tail(self, q):
+        """返回 (q分位数, 不高于该分位数的值的均值)"""
+        target = q * (self.total - 1)
+        cum = np.cumsum(self.counts)
+        b = int(np.searchsorted(cum, target, side='right'))
+        before = int(cum[b - 1]) if b > 0 else 0
+        inside = int(self.counts[b])
+        frac = (target - before + 0.5) / inside if inside else 0.0
+
+        if b == 0:
+            # 落在下溢桶：在最小值与下边界之间插值
+            value = self.minimum + frac * (self.low - self.minimum)
+        elif b == self.bins + 1:
+            value = self.high
+        else:
+            value = self.low + (b - 1 + min(frac, 1.0)) * self.width
+
+        # 尾部：完整的低位桶 + 当前桶按比例估计
+        tail_count = before + frac * inside
+        tail_sum = float(self.sums[:b].sum()) + frac * inside * value
+        return value, tail_sum / tail_count if tail_count > 0 else value
+
+    def mean(self):
+        return self.total_sum / self.total
+
+    def std(self):
+        mean = self.mean()
+        return float(np.sqrt(max(self.total_sq / self.total - mean ** 2, 0.0) * self.total / max(self.total - 1, 1)))
+
+def _cholesky(cov):
+    """Cholesky 分解；协方差半正定时逐步加入对角扰动"""
+    cov = np.asarray(cov, dtype=np.float64)
+    jitter = 0.0
+    scale = float(np.mean(np.diag(cov))) or 1.0
+    for _ in range(8):
+        try:
+            return np.linalg.cholesky(cov + jitter * np.eye(len(cov)))
+        except np.linalg.LinAlgError:
+            jitter = scale * 1e-10 if jitter == 0 else jitter * 100
+    raise np.linalg.LinAlgError("协方差矩阵无法进行 Cholesky 分解")
+
+def _simulate_block(seed, n_paths, drift, loading, df, low, high, chunk_paths):
+    """模拟一个任务块，返回该块的累加器（在工作进程中执行）
+
+    组合收益 = drift + loading·z，其中 loading = L^T w，因此每条路径
+    只需 O(N) 而不是先生成全部资产收益的 O(N^2)。
+    """
+    rng = np.random.default_rng(seed)
+    acc = TailAccumulator(low, high)
+    # 噪声用 float32 生成和相乘（约快一倍），累加仍为 float64
+    loading32 = np.asarray(loading, dtype=np.float32)
+    remaining = n_paths
+    while remaining > 0:
+        size = min(chunk_paths, remaining)
+        pnl = (rng.standard_normal((size, len(loading)), dtype=np.float32) @ loading32).astype(np.float64)
+        if df is not None:
+            # 多元t分布：所有资产共享同一个卡方缩放因子
+            pnl *= np.sqrt(df / rng.chisquare(df, size))
+        pnl += drift
+        acc.add(pnl)
+        remaining -= size
+    return acc
+
+def monte_carlo_var(mean, cov, weights=None, confidence_levels=(0.95,), n_paths=1_000_000,
+                    horizon=1, df=None, seed=0, n_workers=None, chunk_paths=CHUNK_PATHS):
+    """蒙特卡洛法计算组合 VaR / CVaR
+
+    通过协方差的 Cholesky 因子模拟相关的多资产组合收益（df 给定时为
+    多元t分布），按固定大小的块生成路径并流式累加到分位数/尾部均值
+    累加器中，内存峰值只与 chunk_paths 和资产数有关。任务块使用由
+    seed 派生的独立随机流，分发到进程池执行；结果与进程数无关。
+
+    返回与 calculate_risk_metrics 同口径（收益率，亏损为负）的字典：
+    {'var': {置信水平: 值}, 'cvar': {置信水平: 值}, 'mean', 'std', 'n_paths'}
+    """
+    mean = np.atleast_1d(np.asarray(mean, dtype=np.float64))
+    cov = np.atleast_2d(np.asarray(cov, dtype=np.float64))
+    weights = np.full(len(mean), 1.0 / len(mean)) if weights is None else np.asarray(weights, dtype=np.float64)
+    if df is not None and df <= 2:
+        raise ValueError("t分布自由度必须大于2")
+
+    drift = float(weights @ mean) * horizon
+    loading = _cholesky(cov * horizon).T @ weights
+    if df is not None:
+        # 缩放使t分布与给定协方差的方差一致
+        loading = loading * np.sqrt((df - 2) / df)
+    sd = float(np.linalg.norm(loading)) * (np.sqrt(df / (df - 2)) if df is not None else 1.0)
+    low, high = drift - HIST_RANGE_SD * sd, drift + HIST_RANGE_SD * sd
+    if sd == 0:
+        low, high = drift - 1e-12, drift + 1e-12
+
+    n_blocks = max(1, -(-n_paths // BLOCK_PATHS))
+    sizes = [BLOCK_PATHS] * (n_blocks - 1) + [n_paths - BLOCK_PATHS * (n_blocks - 1)]
+    seeds = np.random.SeedSequence(seed).spawn(n_blocks)
+    args = [(s, size, drift, loading, df, low, high, chunk_paths) for s, size in zip(seeds, sizes)]
+
+    n_workers = min(n_workers or os.cpu_count() or 1, n_blocks)
+    if n_workers > 1:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            parts = list(pool.map(_simulate_block, *zip(*args)))
+    else:
+        parts = [_simulate_block(*a) for a in args]
+
+    acc = parts[0]
+    for part in parts[1:]:
+        acc.merge(part)
+
+    result = {'var': {}, 'cvar': {}, 'mean': acc.mean(), 'std': acc.std(), 'n_paths': acc.total}
+    for level in np.atleast_1d(confidence_levels):
+        var, cvar = acc.quantile_and_tail(1 - float(level))
+        result['var'][float(level)] = var
+        result['cvar'][float(level)] = cvar
+    return result
+
+def monte_carlo_var_from_returns(returns, weights=None, confidence_levels=(0.95,), cov_method='sample', **kwargs):
+    """由历史收益率（Series 或 (T, N) DataFrame）的均值和协方差计算蒙特卡洛 VaR
+
+    均值和协方差取自协方差服务的缓存（cov_method 为 'sample' / 'ewma' / 'ledoit_wolf'）。
+    """
+    frame = returns.to_frame() if isinstance(returns, pd.Series) else returns
+    mean, cov = covariance_service.get(frame, cov_method, window=len(frame))
+    return monte_carlo_var(mean, cov, weights, confidence_levels, **kwargs)
@@ -0,0 +1,142 @@
+﻿# online_stats.py - 流式风险统计（逐笔 O(1) 更新）
+import numpy as np
+
+from config import RISK_CONFIG
+
+class OnlineRiskStats:
+    """收益率的在线累加器：均值、方差、偏度、峰度、夏普比率、净值峰值与回撤
+
+    矩用 Welford 式递推（Terriberry 的高阶扩展）逐笔更新，两个分区的
+    累加器可用 merge 合并（Pébay 公式），结果与整段数据一次计算相同。
+    净值从1开始按 (1+r) 累乘；峰值与投资组合页一致，取已出现净值的
+    最大值（不含初始的1）。shape 不为 () 时每次更新对多列同时进行。
+    """
+
+    def __init__(self, shape=()):
+        self.shape = shape
+        self.n = 0
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+        self.m3 = np.zeros(shape)
+        self.m4 = np.zeros(shape)
+        self.wealth = np.ones(shape)
+        self.peak = np.full(shape, -np.inf)
+        self.trough = np.full(shape, np.inf)
+        self.max_drawdown = np.zeros(shape)
+
+    def update(self, x):
+        """加入一个观测（标量，或与 shape 相同的数组）"""
+        x = np.asarray(x, dtype=np.float64)
+        n1 = self.n
+        self.n += 1
+        n = self.n
+        delta = x - self.mean
+        delta_n = delta / n
+        delta_n2 = delta_n * delta_n
+        term1 = delta * delta_n * n1
+        self.mean = self.mean + delta_n
+        self.m4 = self.m4 + term1 * delta_n2 * (n * n - 3 * n + 3) + 6 * delta_n2 * self.m2 - 4 * delta_n * self.m3
+        self.m3 = self.m3 + term1 * delta_n * (n - 2) - 3 * delta_n * self.m2
+        self.m2 = self.m2 + term1
+
+        self.wealth = self.wealth * (1 + x)
+        self.peak = np.maximum(self.peak, self.wealth)
+        self.trough = np.minimum(self.trough, self.wealth)
+        self.max_drawdown = np.minimum(self.max_drawdown, self.wealth / self.peak - 1)
+        return self
+
+    @classmethod
+    def from_returns(cls, returns):
+        """由一段收益率（(T,) 或 (T, N)）一次性构建累加器"""
+        values = np.asarray(returns, dtype=np.float64)
+        stats = cls(values.shape[1:])
+        if len(values) == 0:
+            return stats
+
+        stats.n = len(values)
+        stats.mean = values.mean(axis=0)
+        dev = values - stats.mean
+        dev2 = dev * dev
+        stats.m2 = dev2.sum(axis=0)
+        stats.m3 = (dev2 * dev).sum(axis=0)
+        stats.m4 = (dev2 * dev2).sum(axis=0)
+
+        wealth = np.cumprod(1 + values, axis=0)
+        peaks = np.maximum.accumulate(wealth, axis=0)
+        stats.wealth = wealth[-1]
+        stats.peak = peaks[-1]
+        stats.trough = wealth.min(axis=0)
+        stats.max_drawdown = np.minimum((wealth / peaks - 1).min(axis=0), 0.0)
+        return stats
+
+    def extend(self, returns):
+        """批量加入一段新的收益率，等价于逐笔 update"""
+        return self.merge(OnlineRiskStats.from_returns(returns))
+
+    def merge(self, other):
+        """合并紧接在本分区之后的另一分区（合并矩的顺序无关，回撤按时间先后）"""
+        if other.n == 0:
+            return self
+        if self.n == 0:
+            self.__dict__.update({k: np.copy(v) if isinstance(v, np.ndarray) else v
+                                  for k, v in other.__dict__.items()})
+            return self
+
+        na, nb = self.n, other.n
+        n = na + nb
+        delta = other.mean - self.mean
+        delta2 = delta * delta
+        m2a, m3a = self.m2, self.m3
+        self.mean = self.mean + delta * nb / n
+        self.m4 = (self.m4 + other.m4
+                   + delta2 * delta2 * na * nb * (na * na - na * nb + nb * nb) / n ** 3
+                   + 6 * delta2 * (na * na * other.m2 + nb * nb * m2a) / n ** 2
+                   + 4 * delta * (na * other.m3 - nb * m3a) / n)
+        self.m3 = (m3a + other.m3
+                   + delta2 * delta * na * nb * (na - nb) / n ** 2
+                   + 3 * delta * (na * other.m2 - nb * m2a) / n)
+        self.m2 = m2a + other.m2 + delta2 * na * nb / n
+        self.n = n
+
+        # 后一分区的最深回撤：要么是其自身的回撤，要么是其最低净值相对本分区峰值的回撤
+        self.max_drawdown = np.minimum.reduce([
+            self.max_drawdown,
+            other.max_drawdown,
+            self.wealth * other.trough / self.peak - 1,
+        ])
+        self.trough = np.minimum(self.trough, self.wealth * other.trough)
+        self.peak = np.maximum(self.peak, self.wealth * other.peak)
+        self.wealth = self.wealth * other.wealth
+        return self
+
+    def metrics(self, risk_free_rate=None):
+        """返回与 calculate_risk_metrics 同名同口径的指标，另含回撤相关字段"""
+        if self.n == 0:
+            return {}
+
+        risk_free_rate = RISK_CONFIG['default_risk_free'] if risk_free_rate is None else risk_free_rate
+        n = self.n
+        with np.errstate(divide='ignore', invalid='ignore'):
+            std = np.sqrt(self.m2 / (n - 1)) if n > 1 else np.full(self.shape, np.nan)
+            skewness = np.where(self.m2 > 0, np.sqrt(n) * self.m3 / self.m2 ** 1.5, np.nan)
+            kurtosis = np.where(self.m2 > 0, n * self.m4 / self.m2 ** 2 - 3.0, np.nan)
+            annual_return = self.mean * 252
+            annual_volatility = std * np.sqrt(252)
+            sharpe = np.where(annual_volatility > 0, (annual_return - risk_free_rate) / annual_volatility, 0.0)
+
+        metrics = {
+            'mean_return': self.mean,
+            'std_return': std,
+            'annual_return': annual_return,
+            'annual_volatility': annual_volatility,
+            'sharpe_ratio': sharpe,
+            'skewness': skewness,
+            'kurtosis': kurtosis,
+            'cumulative_return': self.wealth - 1,
+            'peak': self.peak,
+            'drawdown': self.wealth / self.peak - 1,
+            'max_drawdown': self.max_drawdown,
+        }
+        if self.shape == ():
+            metrics = {k: float(v) for k, v in metrics.items()}
+        return metrics
@@ -0,0 +1,221 @@
+﻿# optimizer.py - 均值-方差优化与有效前沿
+import numpy as np
+import pandas as pd
+from scipy.linalg import cho_factor, cho_solve
+
+from config import RISK_CONFIG
+
+# 有效前沿粗网格：λ 在 [λ_max × FRONTIER_LAMBDA_RATIO, λ_max] 上等比取 FRONTIER_COARSE_POINTS 个点
+FRONTIER_LAMBDA_RATIO = 1e-8
+FRONTIER_COARSE_POINTS = 40
+# 求最大夏普比率时黄金分割搜索的迭代次数
+SHARPE_SEARCH_STEPS = 30
+
+def _project_budget(w, lower, upper, total=1.0):
+    """将 w 投影到 {lower <= w <= upper, sum(w) = total}：二分平移量 τ，使 clip(w + τ) 之和为 total"""
+    if (w >= lower).all() and (w <= upper).all() and abs(w.sum() - total) < 1e-12:
+        return w.copy()
+    lo, hi = (lower - w).min(), (upper - w).max()
+    for _ in range(100):
+        tau = 0.5 * (lo + hi)
+        if np.clip(w + tau, lower, upper).sum() > total:
+            hi = tau
+        else:
+            lo = tau
+    return np.clip(w + 0.5 * (lo + hi), lower, upper)
+
+class MeanVarianceOptimizer:
+    """带预算约束 (权重和为1) 与上下限约束的均值-方差优化器
+
+    求解 min ½w'Σw - λμ'w，λ=0 为最小方差组合，λ 增大时沿有效前沿
+    移向高收益端。使用原始积极集法：每次迭代只在自由资产上解一个
+    Cholesky 方程组，边界资产固定；以上一个解（及其积极集）热启动时
+    通常只需增减少数几个资产，因此沿前沿连续求解很快。
+    μ、Σ 在内部按年化并以平均方差归一，数值尺度与输入无关。
+    """
+
+    def __init__(self, mean, cov, bounds=(0.0, 1.0), risk_free_rate=None, periods_per_year=252, tickers=None):
+        self.tickers = list(tickers) if tickers is not None else None
+        self.mean = np.asarray(mean, dtype=np.float64) * periods_per_year
+        self.cov = np.asarray(cov, dtype=np.float64) * periods_per_year
+        n = len(self.mean)
+        self.lower = np.broadcast_to(np.asarray(bounds[0], dtype=np.float64), (n,)).copy()
+        self.upper = np.broadcast_to(np.asarray(bounds[1], dtype=np.float64), (n,)).copy()
+        if self.lower.sum() > 1 + 1e-12 or self.upper.sum() < 1 - 1e-12:
+            raise ValueError("权重上下限与权重和为1的约束不相容")
+        self.risk_free_rate = RISK_CONFIG['default_risk_free'] if risk_free_rate is None else risk_free_rate
+
+        self._scale = 1.0 / (float(np.mean(np.diag(self.cov))) or 1.0)
+        self._c = self.cov * self._scale
+        # 微小的对角扰动保证自由子块正定（样本协方差可能奇异）
+        self._c[np.diag_indices(n)] += 1e-10
+        self._m = self.mean * self._scale
+        # 协方差只分解一次：H = Σ^{-1}，自由子块的方程组由 H 经舒尔补得到
+        self._h = cho_solve(cho_factor(self._c), np.eye(n))
+
+    def _solve_free(self, free, rhs):
+        """解 Σ_FF x = rhs（F 为自由资产）
+
+        自由资产较少时直接分解 Σ_FF；否则利用预先求得的 H = Σ^{-1}：
+        Σ_FF^{-1} = H_FF - H_FB H_BB^{-1} H_BF，只需分解较小的 H_BB。
+        """
+        fixed = ~free
+        n_free = int(free.sum())
+        if n_free <= len(free) - n_free:
+            return cho_solve(cho_factor(self._c[np.ix_(free, free)], check_finite=False), rhs, check_finite=False)
+        full = np.zeros((len(free), rhs.shape[1]))
+        full[free] = rhs
+        u = self._h @ full
+        if n_free == len(free):
+            return u
+        h_fixed = self._h[:, fixed]
+        v = cho_solve(cho_factor(h_fixed[fixed], check_finite=False), u[fixed], check_finite=False)
+        return u[free] - h_fixed[free] @ v
+
+    def solve(self, lam, x0=None, max_iter=None):
+        """求解 min ½w'Σw - λμ'w（μ、Σ 为内部归一化尺度），x0 为热启动点"""
+        c, n = self._c, len(self._m)
+        q = lam * self._m
+        lower, upper = self.lower, self.upper
+        w = _project_budget(np.full(n, 1.0 / n) if x0 is None else np.asarray(x0, dtype=np.float64), lower, upper)
+
+        # 积极集：0 自由，-1 位于下限，1 位于上限
+        state = np.zeros(n, dtype=np.int8)
+        state[w <= lower + 1e-12] = -1
+        state[(w >= upper - 1e-12) & (state == 0)] = 1
+        w = np.where(state == -1, lower, np.where(state == 1, upper, w))
+        if state.all():
+            # 全部资产都在边界时释放一个，使预算约束有自由度
+            state[np.argmax(upper - lower)] = 0
+
+        max_iter = max_iter or 10 * n + 50
+        for _ in range(max_iter):
+            free = state == 0
+            fixed = ~free
+            rhs = q[free] - (c @ np.where(fixed, w, 0.0))[free]
+            a, b = self._solve_free(free, np.column_stack([rhs, np.ones(free.sum())])).T
+            gamma = (1.0 - w[fixed].sum() - a.sum()) / b.sum()
+            target = a + gamma * b
+            step = target - w[free]
+
+            if np.abs(step).max() < 1e-12:
+                # 在当前积极集上已最优：检查边界资产的乘子
+                grad = c @ w - q - gamma
+                violation = np.where(state == -1, -grad, np.where(state == 1, grad, 0.0))
+                worst = int(np.argmax(violation))
+                if violation[worst] <= 1e-12:
+                    return w
+                state[worst] = 0
+                continue
+
+            # 比值检验：沿 step 前进直到碰到某个上下限
+            wf, lo_f, up_f = w[free], lower[free], upper[free]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                ratio = np.where(step < 0, (lo_f - wf) / step, np.where(step > 0, (up_f - wf) / step, np.inf))
+            block = int(np.argmin(ratio))
+            alpha = min(1.0, max(ratio[block], 0.0))
+            w[free] = wf + alpha * step
+            if alpha < 1.0:
+                idx = np.flatnonzero(free)[block]
+                state[idx] = -1 if step[block] < 0 else 1
+                w[idx] = lower[idx] if step[block] < 0 else upper[idx]
+        return w
+
+    def portfolio_stats(self, w):
+        """返回 (年化收益, 年化波动, 夏普比率)"""
+        ret = float(self.mean @ w)
+        vol = float(np.sqrt(max(w @ self.cov @ w, 0.0)))
+        return ret, vol, (ret - self.risk_free_rate) / vol if vol > 0 else 0.0
+
+    def _weights(self, w):
+        return pd.Series(w, index=self.tickers) if self.tickers is not None else w
+
+    def min_variance(self):
+        """最小方差组合"""
+        return self._weights(self.solve(0.0))
+
+    def max_return(self):
+        """收益最高的可行组合：按预期收益从高到低依次填满上限"""
+        w = self.lower.copy()
+        remaining = 1.0 - w.sum()
+        for i in np.argsort(-self.mean):
+            add = min(self.upper[i] - w[i], remaining)
+            w[i] += add
+            remaining -= add
+            if remaining <= 0:
+                break
+        return self._weights(w)
+
+    def _lambda_max(self, x0=None):
+        """λ 增大到该值后解不再变化（已到达最高收益组合）"""
+        target = np.asarray(self.max_return())
+        lam, w = 1.0, x0
+        for _ in range(60):
+            w = self.solve(lam, w)
+            if np.abs(w - target).max() < 1e-9:
+                return lam
+            lam *= 2.0
+        return lam
+
+    def efficient_frontier(self, n_points=100):
+        """逐点热启动求解整条有效前沿，各点的收益率大致等距
+
+        先在等比 λ 粗网格上求出收益率随 λ 的变化（积极集不变时两者呈线性
+        关系），再插值得到对应等距目标收益率的 λ，依次热启动求解。
+        返回 (DataFrame[lambda, return, volatility, sharpe], 权重矩阵 (点数, 资产数))。
+        """
+        w = self.solve(0.0)
+        lam_max = self._lambda_max(w)
+        coarse = np.concatenate([[0.0], np.geomspace(lam_max * FRONTIER_LAMBDA_RATIO, lam_max,
+                                                     FRONTIER_COARSE_POINTS)])
+        coarse_return = np.empty(len(coarse))
+        for k, lam in enumerate(coarse):
+            w = self.solve(lam, w)
+            coarse_return[k] = self.mean @ w
+        coarse_return = np.maximum.accumulate(coarse_return)
+        targets = np.linspace(coarse_return[0], coarse_return[-1], n_points)
+        lams = np.interp(targets, coarse_return, coarse)
+
+        w = self.solve(0.0, w)
+        weights = np.empty((n_points, len(self._m)))
+        rows = []
+        for k, lam in enumerate(lams):
+            w = self.solve(lam, w)
+            weights[k] = w
+            rows.append((lam, *self.portfolio_stats(w)))
+        frontier = pd.DataFrame(rows, columns=['lambda', 'return', 'volatility', 'sharpe'])
+        if self.tickers is not None:
+            weights = pd.DataFrame(weights, columns=self.tickers)
+        return frontier, weights
+
+    def max_sharpe(self, frontier=None):
+        """最大夏普比率组合：在前沿上找到最优点，再在相邻 λ 区间内做黄金分割搜索"""
+        if frontier is None:
+            frontier, weights = self.efficient_frontier(50)
+        else:
+            frontier, weights = frontier
+        weights = np.asarray(weights)
+        best = int(frontier['sharpe'].idxmax())
+        lams = frontier['lambda'].to_numpy()
+        lo, hi = lams[max(best - 1, 0)], lams[min(best + 1, len(lams) - 1)]
+        w = weights[best]
+
+        def sharpe(lam, x0):
+            w = self.solve(lam, x0)
+            return self.portfolio_stats(w)[2], w
+
+        ratio = (np.sqrt(5) - 1) / 2
+        x1, x2 = hi - ratio * (hi - lo), lo + ratio * (hi - lo)
+        f1, w1 = sharpe(x1, w)
+        f2, w2 = sharpe(x2, w)
+        for _ in range(SHARPE_SEARCH_STEPS):
+            if f1 < f2:
+                lo, x1, f1, w1 = x1, x2, f2, w2
+                x2 = lo + ratio * (hi - lo)
+                f2, w2 = sharpe(x2, w1)
+            else:
+                hi, x2, f2, w2 = x2, x1, f1, w1
+                x1 = hi - ratio * (hi - lo)
+                f1, w1 = sharpe(x1, w2)
+        candidates = [(frontier['sharpe'].iloc[best], weights[best]), (f1, w1), (f2, w2)]
+        return self._weights(max(candidates, key=lambda item: item[0])[1])
@@ -0,0 +1,84 @@
+﻿# price_cache.py - 基于Parquet的本地价格缓存
+import os
+import time
+from pathlib import Path
+from urllib.parse import quote
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from config import DATA_SOURCES, PATH_CONFIG
+
+# 缓存目录中的文件：Parquet 缓存，以及旧版本遗留的 pickle 缓存
+CACHE_PATTERNS = ('*.parquet', '*.pkl')
+
+class PriceCache:
+    """按 (股票代码, 周期) 存储价格序列的磁盘缓存
+
+    每个序列保存为一个Parquet文件，按文件修改时间判断是否超过
+    DATA_SOURCES['cache_ttl']。数据来源写入文件元数据，命中时原样返回。
+    """
+
+    SOURCE_KEY = b'finrisk_source'
+
+    def __init__(self, cache_dir=None, ttl=None, enabled=None):
+        self.cache_dir = Path(cache_dir or PATH_CONFIG['cache_dir'])
+        self.ttl = DATA_SOURCES['cache_ttl'] if ttl is None else ttl
+        self.enabled = DATA_SOURCES['cache_enabled'] if enabled is None else enabled
+
+    def _path(self, ticker, period):
+        """缓存文件路径（对代码做转义，兼容 GC=F、^GSPC 等符号）"""
+        return self.cache_dir / f"{quote(ticker, safe='')}_{period}.parquet"
+
+    def get(self, ticker, period):
+        """读取缓存，未命中或已过期时返回 None"""
+        if not self.enabled:
+            return None
+
+        path = self._path(ticker, period)
+        try:
+            if time.time() - path.stat().st_mtime > self.ttl:
+                return None
+            table = pq.read_table(path)
+        except Exception:
+            return None
+
+        metadata = table.schema.metadata or {}
+        source = metadata.get(self.SOURCE_KEY, b'mock').decode()
+        return table.to_pandas(), source
+
+    def put(self, ticker, period, data, source):
+        """写入缓存（先写临时文件再原子替换，避免多进程读到半个文件）"""
+        if not self.enabled:
+            return
+
+        path = self._path(ticker, period)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            table = pa.Table.from_pandas(data)
+            metadata = dict(table.schema.metadata or {})
+            metadata[self.SOURCE_KEY] = source.encode()
+            pq.write_table(table.replace_schema_metadata(metadata), tmp_path)
+            os.replace(tmp_path, path)
+        except Exception:
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+
+    def clear(self, older_than=None):
+        """删除缓存文件，older_than 为秒数时只删除更旧的文件"""
+        if not self.cache_dir.exists():
+            return 0
+
+        cutoff = time.time() - older_than if older_than is not None else None
+        deleted = 0
+        for file in (f for pattern in CACHE_PATTERNS for f in self.cache_dir.glob(pattern)):
+            try:
+                if cutoff is None or file.stat().st_mtime < cutoff:
+                    file.unlink()
+                    deleted += 1
+            except OSError:
+                pass
+        return deleted
@@ -0,0 +1,87 @@
+﻿# price_series.py - 紧凑的数组型OHLCV容器
+import numpy as np
+import pandas as pd
+
+class PriceSeries:
+    """单只股票的OHLCV序列，以连续的NumPy列数组保存
+
+    dates 为 int64 纳秒时间戳，价格列可选 float32 以减半内存；
+    不指定 dtype 时直接引用传入的数组（例如内存映射视图），不复制数据。
+    切片返回共享底层数组的新对象，只在绘图等需要时才转换为DataFrame。
+    """
+
+    __slots__ = ('ticker', 'source', 'dates', 'open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, ticker, dates, open, high, low, close, volume, source="mock", dtype=None):
+        self.ticker = ticker
+        self.source = source
+        self.dates = np.asarray(dates, dtype=np.int64)
+        self.open = np.asarray(open, dtype=dtype)
+        self.high = np.asarray(high, dtype=dtype)
+        self.low = np.asarray(low, dtype=dtype)
+        self.close = np.asarray(close, dtype=dtype)
+        self.volume = np.asarray(volume, dtype=np.int64)
+
+    @classmethod
+    def from_frame(cls, ticker, data, source="mock", dtype=None):
+        """由OHLCV DataFrame 构建（列为内存映射视图时保持零拷贝）"""
+        return cls(
+            ticker,
+            data.index.values.astype('datetime64[ns]').view(np.int64),
+            data['Open'].to_numpy(),
+            data['High'].to_numpy(),
+            data['Low'].to_numpy(),
+            data['Close'].to_numpy(),
+            data['Volume'].to_numpy(),
+            source=source,
+            dtype=dtype,
+        )
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __getitem__(self, key):
+        """按位置切片，返回共享数组的新序列"""
+        if not isinstance(key, slice):
+            raise TypeError("PriceSeries 只支持切片访问")
+        return PriceSeries(
+            self.ticker, self.dates[key], self.open[key], self.high[key],
+            self.low[key], self.close[key], self.volume[key], source=self.source,
+        )
+
+    def __repr__(self):
+        return f"PriceSeries({self.ticker!r}, {len(self)} bars, {self.close.dtype}, source={self.source!r})"
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in ('dates', 'open', 'high', 'low', 'close', 'volume'))
+
+    def index(self):
+        """日期索引（DatetimeIndex）"""
+        return pd.DatetimeIndex(self.dates.view('datetime64[ns]'))
+
+    def returns(self):
+        """简单日收益率（float64），长度比序列少1"""
+        close = self.close.astype(np.float64, copy=False)
+        return close[1:] / close[:-1] - 1
+
+    def astype(self, dtype):
+        """转换价格列精度"""
+        return PriceSeries(
+            self.ticker, self.dates, self.open, self.high, self.low,
+            self.close, self.volume, source=self.source, dtype=dtype,
+        )
+
+    def to_frame(self):
+        """转换为OHLCV DataFrame（列直接引用底层数组）"""
+        return pd.DataFrame(
+            {
+                'Open': self.open,
+                'High': self.high,
+                'Low': self.low,
+                'Close': self.close,
+                'Volume': self.volume,
+            },
+            index=self.index(),
+            copy=False,
+        )
@@ -0,0 +1,228 @@
+﻿# price_store.py - 基于内存映射文件的价格存储
+import json
+import os
+import time
+from pathlib import Path
+from urllib.parse import quote, unquote
+
+import numpy as np
+import pandas as pd
+
+from config import PATH_CONFIG
+
+# 各字段的固定存储类型，dates 为 int64 纳秒时间戳
+STORE_DTYPES = {
+    'dates': np.int64,
+    'Open': np.float64,
+    'High': np.float64,
+    'Low': np.float64,
+    'Close': np.float64,
+    'Volume': np.int64,
+}
+
+def _update_state(close, state=None):
+    """增量更新收盘价派生状态：累计收益、运行最高价和最大回撤
+
+    只需遍历新增的收盘价，已有历史由 state 概括。
+    """
+    close = np.asarray(close, dtype=np.float64)
+    if state is None:
+        state = {'base_close': float(close[0]), 'peak_close': float('-inf'), 'max_drawdown': 0.0}
+    running_max = np.maximum.accumulate(np.concatenate(([state['peak_close']], close)))[1:]
+    peak = float(running_max[-1])
+    return {
+        'base_close': state['base_close'],
+        'last_close': float(close[-1]),
+        'peak_close': peak,
+        'cum_return': float(close[-1] / state['base_close'] - 1),
+        'drawdown': float(close[-1] / peak - 1),
+        'max_drawdown': min(state['max_drawdown'], float((close / running_max - 1).min())),
+    }
+
+class PriceStore:
+    """按股票代码保存OHLCV列文件的内存映射存储
+
+    每只股票一个目录，每个字段一个定长类型的二进制文件，并附带已排序的
+    日期列作为索引。读取时以只读 np.memmap 打开，返回的数组和DataFrame
+    都是文件映射的视图，同一主机上的多个工作进程共享操作系统页缓存。
+
+    写入采用版本号：先写新版本的列文件，再原子替换 meta.json，
+    最后删除旧版本，读取方始终看到完整一致的一组列。追加新K线同样写成
+    新版本（已有列加新增行），从不截断或改写已发布的文件，因此其他进程
+    正在映射的文件不会变短（避免 SIGBUS，Windows 下也不会因截断已映射
+    文件而报错），多个进程同时刷新也不需要文件锁。
+    """
+
+    def __init__(self, store_dir=None):
+        self.store_dir = Path(store_dir or os.path.join(PATH_CONFIG['data_dir'], 'store'))
+        self._maps = {}
+
+    def _ticker_dir(self, ticker):
+        return self.store_dir / quote(ticker, safe='')
+
+    def _read_meta(self, ticker):
+        try:
+            with open(self._ticker_dir(ticker) / 'meta.json', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, ticker, meta):
+        ticker_dir = self._ticker_dir(ticker)
+        tmp_path = ticker_dir / f"meta.json.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, ticker_dir / 'meta.json')
+
+    def tickers(self):
+        """存储中已有的股票代码"""
+        if not self.store_dir.exists():
+            return []
+        return sorted(unquote(d.name) for d in self.store_dir.iterdir() if (d / 'meta.json').exists())
+
+    def has(self, ticker):
+        return self._read_meta(ticker) is not None
+
+    def updated_at(self, ticker):
+        """最后写入时间（时间戳），不存在时返回 None"""
+        meta = self._read_meta(ticker)
+        return meta['updated_at'] if meta else None
+
+    def is_fresh(self, ticker, ttl):
+        updated_at = self.updated_at(ticker)
+        return updated_at is not None and time.time() - updated_at <= ttl
+
+    def _publish(self, ticker, columns, meta, old_meta):
+        """把各列写成新版本文件，原子替换 meta.json 后删除旧版本"""
+        ticker_dir = self._ticker_dir(ticker)
+        ticker_dir.mkdir(parents=True, exist_ok=True)
+        version = f"{time.time_ns():x}-{os.getpid():x}"
+
+        for field, values in columns.items():
+            np.ascontiguousarray(values, dtype=STORE_DTYPES[field]).tofile(
+                ticker_dir / f"{field}-{version}.bin"
+            )
+
+        self._write_meta(ticker, dict(meta, version=version, length=len(columns['dates']),
+                                      updated_at=time.time()))
+
+        # 已映射旧版本的进程仍可继续读取（POSIX 下删除不影响已打开的映射；
+        # Windows 下已映射的文件无法删除，忽略错误，旧文件保留在磁盘上）
+        if old_meta and old_meta['version'] != version:
+            for field in STORE_DTYPES:
+                try:
+                    (ticker_dir / f"{field}-{old_meta['version']}.bin").unlink()
+                except OSError:
+                    pass
+
+    def write(self, ticker, data, source):
+        """写入（覆盖）一只股票的完整历史，data 为按日期排序的OHLCV DataFrame"""
+        old_meta = self._read_meta(ticker)
+        columns = {'dates': data.index.values.astype('datetime64[ns]').view(np.int64)}
+        for field in STORE_DTYPES:
+            if field != 'dates':
+                columns[field] = data[field].to_numpy()
+
+        self._publish(ticker, columns, {
+            'source': source,
+            'state': _update_state(columns['Close']) if len(data) else None,
+        }, old_meta)
+
+    def append(self, ticker, data, source):
+        """在已有历史末尾追加晚于最后一根K线的数据，返回追加的行数
+
+        新增行与已有列一起写成新版本后发布，派生状态只对新增部分增量更新；
+        股票不存在时等同于 write。
+        """
+        meta = self._read_meta(ticker)
+        result = self.read_arrays(ticker)
+        if meta is None or result is None:
+            self.write(ticker, data, source)
+            return len(data)
+
+        arrays = result[0]
+        dates = data.index.values.astype('datetime64[ns]').view(np.int64)
+        new_rows = dates > int(arrays['dates'][-1])
+        if not new_rows.any():
+            self.touch(ticker)
+            return 0
+
+        columns = {'dates': np.concatenate([arrays['dates'], dates[new_rows]])}
+        for field in STORE_DTYPES:
+            if field != 'dates':
+                columns[field] = np.concatenate([arrays[field], data[field].to_numpy()[new_rows]])
+
+        state = meta.get('state') or _update_state(arrays['Close'])
+        self._publish(ticker, columns, {
+            'source': meta['source'] if source == meta['source'] else 'mixed',
+            'state': _update_state(columns['Close'][len(arrays['dates']):], state),
+        }, meta)
+        return int(new_rows.sum())
+
+    def touch(self, ticker):
+        """仅刷新写入时间（数据已是最新时使用）"""
+        meta = self._read_meta(ticker)
+        if meta is not None:
+            meta['updated_at'] = time.time()
+            self._write_meta(ticker, meta)
+
+    def last_date(self, ticker):
+        """最后一根K线的日期，不存在时返回 None"""
+        result = self.read_arrays(ticker)
+        if result is None:
+            return None
+        return pd.Timestamp(int(result[0]['dates'][-1]))
+
+    def state(self, ticker):
+        """派生状态（累计收益、运行最高价、当前回撤、最大回撤），不存在时返回 None"""
+        meta = self._read_meta(ticker)
+        return meta.get('state') if meta else None
+
+    def read_arrays(self, ticker, start=None, end=None):
+        """返回 ({字段: 只读memmap视图}, 数据来源)，不存在时返回 None
+
+        start/end 可选，按已排序的日期列二分查找后切片，切片仍为视图。
+        """
+        meta = self._read_meta(ticker)
+        if meta is None or meta['length'] == 0:
+            return None
+
+        key = (ticker, meta['version'], meta['length'])
+        arrays = self._maps.get(key)
+        if arrays is None:
+            ticker_dir = self._ticker_dir(ticker)
+            try:
+                arrays = {
+                    field: np.memmap(ticker_dir / f"{field}-{meta['version']}.bin",
+                                     dtype=dtype, mode='r', shape=(meta['length'],))
+                    for field, dtype in STORE_DTYPES.items()
+                }
+            except (OSError, ValueError):
+                return None
+            # 同一股票只保留最新版本的映射
+            for old_key in [k for k in self._maps if k[0] == ticker]:
+                del self._maps[old_key]
+            self._maps[key] = arrays
+
+        lo, hi = 0, meta['length']
+        dates = arrays['dates']
+        if start is not None:
+            lo = int(np.searchsorted(dates, pd.Timestamp(start).value, side='left'))
+        if end is not None:
+            hi = int(np.searchsorted(dates, pd.Timestamp(end).value, side='right'))
+        return {field: values[lo:hi] for field, values in arrays.items()}, meta['source']
+
+    def read(self, ticker, start=None, end=None):
+        """返回 (OHLCV DataFrame, 数据来源)，各列直接引用内存映射，不复制数据"""
+        result = self.read_arrays(ticker, start, end)
+        if result is None:
+            return None
+
+        arrays, source = result
+        index = pd.DatetimeIndex(arrays['dates'].view('datetime64[ns]'))
+        data = pd.DataFrame(
+            {field: arrays[field] for field in STORE_DTYPES if field != 'dates'},
+            index=index,
+            copy=False,
+        )
+        return data, source
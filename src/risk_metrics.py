@@ -0,0 +1,271 @@
+﻿# risk_metrics.py - 风险指标计算
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from config import RISK_CONFIG
+
+def calculate_risk_metrics(returns, confidence_level=0.95):
+    """计算风险指标"""
+    metrics = {}
+
+    if len(returns) == 0:
+        return metrics
+
+    # 基础统计
+    metrics['mean_return'] = returns.mean()
+    metrics['std_return'] = returns.std()
+
+    # 年化指标
+    metrics['annual_return'] = metrics['mean_return'] * 252
+    metrics['annual_volatility'] = metrics['std_return'] * np.sqrt(252)
+
+    # VaR (历史模拟法)
+    metrics['var'] = np.percentile(returns, (1 - confidence_level) * 100)
+
+    # CVaR
+    var_threshold = metrics['var']
+    tail_returns = returns[returns <= var_threshold]
+    metrics['cvar'] = tail_returns.mean() if len(tail_returns) > 0 else metrics['var']
+
+    # 夏普比率
+    risk_free_rate = RISK_CONFIG['default_risk_free']
+    if metrics['annual_volatility'] > 0:
+        metrics['sharpe_ratio'] = (metrics['annual_return'] - risk_free_rate) / metrics['annual_volatility']
+    else:
+        metrics['sharpe_ratio'] = 0
+
+    # 偏度和峰度
+    metrics['skewness'] = stats.skew(returns)
+    metrics['kurtosis'] = stats.kurtosis(returns)
+
+    return metrics
+
+def _level_label(level):
+    return f"{level * 100:g}"
+
+def _tail_quantile(level):
+    """VaR 对应的分位数，按 np.percentile((1-level)*100) 的方式换算"""
+    return (1 - level) * 100 / 100
+
+def _lerp(a, b, t):
+    """与 np.percentile 相同的线性插值（t >= 0.5 时从 b 端插值），
+    保证 VaR 与参考实现逐位一致，与 VaR 相等的观测值计入尾部的判断也一致"""
+    diff = b - a
+    return np.where(t >= 0.5, b - diff * (1 - t), a + diff * t)
+
+def batch_risk_metrics(returns, confidence_levels=(0.95,)):
+    """对 (T, N) 收益率矩阵和多个置信水平批量计算风险指标
+
+    与 calculate_risk_metrics 口径一致（标准差 ddof=1，VaR 为线性插值
+    分位数，CVaR 为不高于 VaR 的收益率均值，偏度/峰度为有偏估计）。
+    每列只排序一次，所有指标按列向量化计算；缺失值按列忽略。
+
+    返回以资产为行的 DataFrame，列为 mean_return、std_return、annual_return、
+    annual_volatility、sharpe_ratio、skewness、kurtosis 以及每个置信水平的
+    var_95 / cvar_95 等。
+    """
+    frame = returns.to_frame() if isinstance(returns, pd.Series) else pd.DataFrame(returns)
+    values = frame.to_numpy(dtype=np.float64)
+    n_obs, n_cols = values.shape
+    levels = np.atleast_1d(np.asarray(confidence_levels, dtype=np.float64))
+
+    # 排序后缺失值位于每列末尾，有效观测数为 n
+    ordered = np.sort(values, axis=0)
+    valid = ~np.isnan(ordered)
+    n = valid.sum(axis=0)
+    has_data = n > 0
+    safe_n = np.maximum(n, 1)
+    clean = np.where(valid, ordered, 0.0)
+
+    # 中心矩
+    mean = clean.sum(axis=0) / safe_n
+    dev = np.where(valid, ordered - mean, 0.0)
+    m2 = (dev ** 2).sum(axis=0) / safe_n
+    m3 = (dev ** 3).sum(axis=0) / safe_n
+    m4 = (dev ** 4).sum(axis=0) / safe_n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        std = np.sqrt(m2 * n / (n - 1))
+        skewness = np.where(m2 > 0, m3 / m2 ** 1.5, np.nan)
+        kurtosis = np.where(m2 > 0, m4 / m2 ** 2 - 3.0, np.nan)
+
+    annual_return = mean * 252
+    annual_volatility = std * np.sqrt(252)
+    risk_free_rate = RISK_CONFIG['default_risk_free']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(annual_volatility > 0, (annual_return - risk_free_rate) / annual_volatility, 0.0)
+
+    result = {
+        'mean_return': mean,
+        'std_return': std,
+        'annual_return': annual_return,
+        'annual_volatility': annual_volatility,
+        'sharpe_ratio': sharpe,
+        'skewness': skewness,
+        'kurtosis': kurtosis,
+    }
+
+    # 各置信水平的 VaR/CVaR：在已排序的列上插值，尾部和由前缀和得到
+    prefix = np.vstack([np.zeros((1, n_cols)), np.cumsum(clean, axis=0)])
+    cols = np.arange(n_cols)
+    last = np.maximum(n - 1, 0)
+    for level in levels:
+        h = (n - 1) * _tail_quantile(level)
+        lo = np.floor(np.maximum(h, 0)).astype(np.int64)
+        hi = np.minimum(lo + 1, last)
+        x_lo, x_hi = ordered[lo, cols], ordered[hi, cols]
+        var = _lerp(x_lo, x_hi, h - lo)
+        # 不高于 VaR 的观测个数（有效值按升序排列）
+        tail_count = (valid & (ordered <= var)).sum(axis=0)
+        tail_sum = prefix[tail_count, cols]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cvar = np.where(tail_count > 0, tail_sum / tail_count, var)
+
+        label = _level_label(level)
+        result[f'var_{label}'] = np.where(has_data, var, np.nan)
+        result[f'cvar_{label}'] = np.where(has_data, cvar, np.nan)
+
+    metrics = pd.DataFrame(result, index=frame.columns)
+    metrics.loc[~has_data] = np.nan
+    return metrics
+
+class _RankTree:
+    """按值排名索引的树状数组（Fenwick树），对多列同时操作
+
+    每列的全部观测值预先排序得到互不相同的排名，窗口中的元素以排名
+    计数，同时记录对应值之和。插入/删除、求第k小的值、求不超过某排名
+    的元素个数与和都是 O(log n)，每一步对所有列向量化执行（内部使用
+    展平索引）。缺失值不进入树中。
+    """
+
+    def __init__(self, values):
+        n_obs, n_cols = values.shape
+        order = np.argsort(values, axis=0, kind='stable')
+        ordered = np.take_along_axis(values, order, axis=0)
+        self.sorted_values = ordered.T.ravel()
+        self.ranks = np.empty((n_obs, n_cols), dtype=np.int64)
+        np.put_along_axis(self.ranks, order, np.arange(1, n_obs + 1)[:, None], axis=0)
+        self.valid = ~np.isnan(values)
+
+        # 与某排名的值相等的最大排名（相同值的排名连续）
+        is_last = np.ones((n_obs, n_cols), dtype=bool)
+        is_last[:-1] = ordered[:-1] != ordered[1:]
+        last = np.where(is_last, np.arange(1, n_obs + 1)[:, None], n_obs)
+        self.last_equal = np.minimum.accumulate(last[::-1], axis=0)[::-1].T.ravel()
+
+        self.size = n_obs
+        self.value_base = np.arange(n_cols) * n_obs
+        self.col_base = np.arange(n_cols) * (n_obs + 1)
+        self.count = np.zeros(n_cols * (n_obs + 1), dtype=np.int64)
+        self.total = np.zeros(n_cols * (n_obs + 1))
+        self.top_step = 1 << (n_obs.bit_length() - 1) if n_obs > 0 else 0
+
+    def update(self, t, sign):
+        """加入 (sign=1) 或移除 (sign=-1) 第 t 个观测值（所有非缺失的列）"""
+        valid = self.valid[t]
+        idx = self.ranks[t][valid]
+        base = self.col_base[valid]
+        values = sign * self.sorted_values[self.value_base[valid] + idx - 1]
+        while len(idx):
+            flat = base + idx
+            self.count[flat] += sign
+            self.total[flat] += values
+            idx = idx + (idx & -idx)
+            keep = idx <= self.size
+            if not keep.all():
+                idx, base, values = idx[keep], base[keep], values[keep]
+
+    def kth(self, k, col_base=None):
+        """返回 (第k小的值, 其排名)，k 为各列窗口内的秩（从1开始）
+
+        col_base 可重复同一列，以便一次查询同一列的多个秩。
+        """
+        col_base = self.col_base if col_base is None else col_base
+        pos = np.zeros(len(col_base), dtype=np.int64)
+        remaining = np.asarray(k, dtype=np.int64).copy()
+        step = self.top_step
+        while step:
+            nxt = pos + step
+            flat = col_base + np.minimum(nxt, self.size)
+            cnt = self.count[flat]
+            move = (nxt <= self.size) & (cnt < remaining)
+            pos = np.where(move, nxt, pos)
+            remaining = remaining - np.where(move, cnt, 0)
+            step >>= 1
+        cols = col_base // (self.size + 1)
+        pos = np.minimum(pos, self.size - 1)
+        return self.sorted_values[cols * self.size + pos], pos + 1
+
+    def prefix(self, rank):
+        """各列窗口内排名不超过 rank 的元素个数与和"""
+        idx = np.asarray(rank, dtype=np.int64).copy()
+        count = np.zeros(len(idx), dtype=np.int64)
+        total = np.zeros(len(idx))
+        while (idx > 0).any():
+            flat = self.col_base + idx
+            active = idx > 0
+            count += np.where(active, self.count[flat], 0)
+            total += np.where(active, self.total[flat], 0.0)
+            idx = idx - (idx & -idx)
+        return count, total
+
+def rolling_var_cvar(returns, window=None, confidence_level=0.95):
+    """滚动窗口的历史模拟 VaR 和 CVaR
+
+    与 calculate_risk_metrics 口径一致：VaR 为窗口内收益率的
+    np.percentile（线性插值），CVaR 为不高于 VaR 的收益率均值（与 VaR
+    相等的重复值全部计入）。缺失值按列忽略，与 batch_risk_metrics 相同。
+    窗口滑动时只插入新值、删除旧值，借助排名树状数组每步 O(log n)，
+    不再对每个窗口重新求分位数；多列同时计算。
+
+    returns 为 Series 时返回列为 ['var', 'cvar'] 的 DataFrame；
+    为 (T, N) DataFrame 时返回 (var_df, cvar_df)。前 window-1 行为 NaN。
+    """
+    window = window or RISK_CONFIG['default_window']
+    is_series = isinstance(returns, pd.Series)
+    frame = returns.to_frame() if is_series else returns
+    values = frame.to_numpy(dtype=np.float64)
+    n_obs, n_cols = values.shape
+
+    var = np.full((n_obs, n_cols), np.nan)
+    cvar = np.full((n_obs, n_cols), np.nan)
+    if n_obs >= window:
+        tree = _RankTree(values)
+        # 一次查询同时取第 lo+1 和第 lo+2 小的值
+        col_base = np.concatenate([tree.col_base, tree.col_base])
+        value_base = tree.value_base
+        n_valid = np.zeros(n_cols, dtype=np.int64)
+        for t in range(window - 1):
+            tree.update(t, 1)
+            n_valid += tree.valid[t]
+        for t in range(window - 1, n_obs):
+            tree.update(t, 1)
+            n_valid += tree.valid[t]
+            if t >= window:
+                tree.update(t - window, -1)
+                n_valid -= tree.valid[t - window]
+
+            # 线性插值位置：VaR 位于窗口内第 lo 和 lo+1 个次序统计量之间（从0开始）
+            has_data = n_valid > 0
+            n = np.maximum(n_valid, 1)
+            h = (n - 1) * _tail_quantile(confidence_level)
+            lo = np.floor(h).astype(np.int64)
+            frac = h - lo
+            hi_rank = np.minimum(lo + 2, n)
+
+            x_both, rank_both = tree.kth(np.concatenate([lo + 1, hi_rank]), col_base)
+            x_lo, x_hi = x_both[:n_cols], x_both[n_cols:]
+            v = _lerp(x_lo, x_hi, frac)
+            # 不高于 VaR 的元素即排名不超过（与 VaR 相等的）最后一个排名的元素
+            bound = np.where(x_hi <= v, rank_both[n_cols:], rank_both[:n_cols])
+            bound = tree.last_equal[value_base + bound - 1]
+            tail_count, tail_sum = tree.prefix(bound)
+            var[t] = np.where(has_data, v, np.nan)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                cvar[t] = np.where(has_data, tail_sum / tail_count, np.nan)
+
+    var = pd.DataFrame(var, index=frame.index, columns=frame.columns)
+    cvar = pd.DataFrame(cvar, index=frame.index, columns=frame.columns)
+    if is_series:
+        return pd.DataFrame({'var': var.iloc[:, 0], 'cvar': cvar.iloc[:, 0]})
+    return var, cvar
@@ -0,0 +1,19 @@
+﻿# rng.py - 进程无关的确定性随机数生成
+import hashlib
+
+import numpy as np
+
+def stable_seed(*parts):
+    """由任意键生成稳定的128位种子
+
+    不使用内置 hash()：字符串哈希在每个进程中加盐，不同工作进程结果不同。
+    """
+    key = '\x1f'.join(str(part) for part in parts).encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(key, digest_size=16).digest(), 'little')
+
+def make_rng(ticker, period, scenario="base"):
+    """返回以 (股票代码, 周期, 情景) 为键的独立随机数生成器
+
+    相同的键在任何进程中都得到相同的序列，且不影响全局 np.random 状态。
+    """
+    return np.random.default_rng(stable_seed(ticker, period, scenario))
@@ -0,0 +1,173 @@
+﻿# simulation.py - 批量收益率模拟引擎
+import time
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # numba 为可选依赖，缺失时列少用标量循环，列多用NumPy逐日向量化
+    njit = None
+
+# 模型参数：r[t] = AR_COEF * r[t-1] + N(mu, sigma * (1 + VOL_FEEDBACK * |r[t-1]|))
+AR_COEF = 0.1
+VOL_FEEDBACK = 0.5
+
+# 极端事件：每 EXTREME_EVERY 天约一次，收益率乘以 ±EXTREME_SCALE
+EXTREME_EVERY = 50
+EXTREME_SCALE = 2
+
+# 无 numba 时不超过该列数使用纯 Python 标量循环（1000 天实测：逐日向量化
+# 约 10ms 且基本与列数无关，标量循环每列约 0.28ms，32 列约 8.8ms、64 列约 18ms）
+SCALAR_MAX_COLUMNS = 32
+
+def _recursion_scalar(mu, sigma, z, phi, feedback):
+    """逐列的标量递推（Python float 运算，无逐步数组开销）"""
+    days, n = z.shape
+    returns = np.empty((n, days))
+    for j in range(n):
+        m, s = float(mu[j]), float(sigma[j])
+        noise = z[:, j].tolist()
+        prev = m + s * noise[0]
+        column = [prev]
+        for x in noise[1:]:
+            prev = phi * prev + m + s * (1 + feedback * abs(prev)) * x
+            column.append(prev)
+        returns[j] = column
+    return returns.T
+
+def _recursion_numpy(mu, sigma, z, phi, feedback):
+    """逐日递推，每一步对所有资产/路径向量化"""
+    returns = np.empty_like(z)
+    returns[0] = mu + sigma * z[0]
+    scale = np.empty_like(z[0])
+    for t in range(1, len(z)):
+        prev = returns[t - 1]
+        np.abs(prev, out=scale)
+        scale *= feedback
+        scale += 1
+        scale *= sigma
+        scale *= z[t]
+        np.multiply(prev, phi, out=returns[t])
+        returns[t] += mu
+        returns[t] += scale
+    return returns
+
+if njit is not None:
+    @njit(cache=True)
+    def _recursion_compiled(mu, sigma, z, phi, feedback):
+        days, n = z.shape
+        returns = np.empty_like(z)
+        for j in range(n):
+            prev = mu[j] + sigma[j] * z[0, j]
+            returns[0, j] = prev
+            for t in range(1, days):
+                prev = phi * prev + mu[j] + sigma[j] * (1 + feedback * abs(prev)) * z[t, j]
+                returns[t, j] = prev
+        return returns
+else:
+    _recursion_compiled = None
+
+def simulate_feedback_returns(mu, sigma, z, phi=AR_COEF, feedback=VOL_FEEDBACK, compiled=None):
+    """由标准正态噪声 z (天数, 列数) 生成AR(1)+波动反馈收益率
+
+    mu/sigma 为每列参数（标量或长度为列数的数组）。与逐点调用
+    rng.normal(mu, sigma_t) 的原始循环在相同噪声下结果一致。
+    compiled=None 时在可用且列数较少时使用numba内核（逐日向量化
+    对少量列的开销主要在Python循环上）；numba 不可用时，列数不超过
+    SCALAR_MAX_COLUMNS 则改用标量循环。
+    """
+    z = np.asarray(z, dtype=np.float64)
+    squeeze = z.ndim == 1
+    if squeeze:
+        z = z[:, None]
+    n = z.shape[1]
+    mu = np.broadcast_to(np.asarray(mu, dtype=np.float64), (n,))
+    sigma = np.broadcast_to(np.asarray(sigma, dtype=np.float64), (n,))
+
+    if compiled is None:
+        compiled = _recursion_compiled is not None and n < 64
+    if compiled and _recursion_compiled is not None:
+        returns = _recursion_compiled(np.ascontiguousarray(mu), np.ascontiguousarray(sigma),
+                                      np.ascontiguousarray(z), float(phi), float(feedback))
+    elif n <= SCALAR_MAX_COLUMNS:
+        returns = _recursion_scalar(mu, sigma, z, float(phi), float(feedback))
+    else:
+        returns = _recursion_numpy(mu, sigma, z, phi, feedback)
+    return returns[:, 0] if squeeze else returns
+
+def extreme_event_multipliers(rng, days, n_cols):
+    """为每列随机选取 max(1, days//50) 个互不相同的日期，乘数为 ±2，其余为1"""
+    k = max(1, days // EXTREME_EVERY)
+    picks = np.argpartition(rng.random((days, n_cols)), k - 1, axis=0)[:k]
+    signs = np.where(rng.random((k, n_cols)) < 0.5, -EXTREME_SCALE, EXTREME_SCALE)
+    multipliers = np.ones((days, n_cols))
+    np.put_along_axis(multipliers, picks, signs, axis=0)
+    return multipliers
+
+def simulate_returns_batch(mu, sigma, rngs, days, n_paths=1):
+    """批量模拟多资产、多路径的收益率，返回 (天数, 资产数, 路径数)
+
+    rngs 为每个资产的随机数生成器（保证每个资产的结果与同批其他资产无关）；
+    噪声和极端事件按资产抽取后，递推对所有 资产×路径 列一次完成。
+    """
+    n_assets = len(rngs)
+    z = np.empty((days, n_assets, n_paths))
+    multipliers = np.empty((days, n_assets, n_paths))
+    for j, rng in enumerate(rngs):
+        z[:, j, :] = rng.standard_normal((n_paths, days)).T
+        multipliers[:, j, :] = extreme_event_multipliers(rng, days, n_paths)
+
+    mu = np.repeat(np.asarray(mu, dtype=np.float64), n_paths)
+    sigma = np.repeat(np.asarray(sigma, dtype=np.float64), n_paths)
+    returns = simulate_feedback_returns(mu, sigma, z.reshape(days, -1))
+    return returns.reshape(days, n_assets, n_paths) * multipliers
+
+def _simulate_loop(mu, sigma, rng, days):
+    """原始的逐日Python循环实现（仅用于基准测试和一致性对比）"""
+    returns = np.zeros(days)
+    for i in range(days):
+        if i == 0:
+            returns[i] = rng.normal(mu, sigma)
+        else:
+            returns[i] = AR_COEF * returns[i-1] + rng.normal(mu, sigma * (1 + VOL_FEEDBACK * abs(returns[i-1])))
+    return returns
+
+def benchmark(days=1000, n_assets=500, n_paths=1, seed=0):
+    """对比逐日循环与批量引擎的耗时，并检查两者在相同噪声下的一致性"""
+    mu = np.full(n_assets, 0.0004)
+    sigma = np.full(n_assets, 0.018)
+
+    # 预热（numba 首次调用需要编译）
+    simulate_feedback_returns(mu[:1], sigma[:1], np.zeros((2, 1)))
+
+    start = time.perf_counter()
+    for j in range(n_assets):
+        for _ in range(n_paths):
+            _simulate_loop(mu[j], sigma[j], np.random.default_rng(seed + j), days)
+    loop_time = time.perf_counter() - start
+
+    rngs = [np.random.default_rng(seed + j) for j in range(n_assets)]
+    start = time.perf_counter()
+    simulate_returns_batch(mu, sigma, rngs, days, n_paths)
+    batch_time = time.perf_counter() - start
+
+    # 一致性：相同噪声下递推结果应与原始循环相同
+    reference = _simulate_loop(mu[0], sigma[0], np.random.default_rng(seed), days)
+    z = np.random.default_rng(seed).standard_normal(days)
+    max_diff = float(np.abs(simulate_feedback_returns(mu[0], sigma[0], z) - reference).max())
+
+    return {
+        'days': days,
+        'columns': n_assets * n_paths,
+        'loop_seconds': loop_time,
+        'batch_seconds': batch_time,
+        'speedup': loop_time / batch_time if batch_time > 0 else float('inf'),
+        'max_abs_diff': max_diff,
+    }
+
+if __name__ == '__main__':
+    for n_assets, n_paths in [(1, 1), (100, 1), (500, 1), (100, 20)]:
+        result = benchmark(n_assets=n_assets, n_paths=n_paths)
+        print(f"资产 {n_assets:4d} × 路径 {n_paths:3d}: 循环 {result['loop_seconds']:.3f}s, "
+              f"批量 {result['batch_seconds']:.3f}s, 加速 {result['speedup']:.1f}x, "
+              f"最大偏差 {result['max_abs_diff']:.2e}")
@@ -0,0 +1,95 @@
+﻿# single_flight.py - 并发请求合并
+import asyncio
+import threading
+
+class _Call:
+    __slots__ = ('event', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = []
+
+    def outcome(self):
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+def _resolve(future, call):
+    if future.cancelled():
+        return
+    if call.error is not None:
+        future.set_exception(call.error)
+    else:
+        future.set_result(call.result)
+
+class SingleFlight:
+    """同一个键同时只执行一次计算，其余并发请求等待并共享结果
+
+    由首个请求（leader）执行计算；计算期间到达的相同键请求直接等待，
+    得到同样的结果或同样的异常。计算结束后键即被释放，之后的请求会
+    重新计算（结果缓存由调用方负责）。线程与协程可以混合使用：
+    协程作为 leader 时计算在线程池中执行，作为等待方时只挂起在
+    future 上，不占用线程也不阻塞事件循环。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    def _join(self, key, loop=None):
+        """加入或发起键为 key 的计算，返回 (call, 是否为leader, 等待用future)"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+                return call, True, None
+
+            self.coalesced += 1
+            future = None
+            if loop is not None:
+                future = loop.create_future()
+                call.waiters.append((loop, future))
+            return call, False, future
+
+    def _run(self, key, call, fn):
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+        finally:
+            with self._lock:
+                del self._calls[key]
+                waiters, call.waiters = call.waiters, []
+            call.event.set()
+            for loop, future in waiters:
+                loop.call_soon_threadsafe(_resolve, future, call)
+        return call.outcome()
+
+    def do(self, key, fn):
+        """执行或加入键为 key 的计算，返回 fn() 的结果"""
+        call, leader, _ = self._join(key)
+        if leader:
+            return self._run(key, call, fn)
+        call.event.wait()
+        return call.outcome()
+
+    async def do_async(self, key, fn):
+        """do 的协程版本，与线程中的同键请求共享同一次计算"""
+        loop = asyncio.get_running_loop()
+        call, leader, future = self._join(key, loop)
+        if leader:
+            return await loop.run_in_executor(None, self._run, key, call, fn)
+        return await future
+
+    def stats(self):
+        with self._lock:
+            return {
+                'executions': self.executions,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._calls),
+            }
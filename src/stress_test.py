@@ -0,0 +1,151 @@
+﻿# stress_test.py - 向量化压力测试引擎
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from config import STRESS_CONFIG
+
+DEFAULT_SECTOR = '其他'
+
+class ScenarioSet:
+    """预编译的情景冲击矩阵
+
+    第 s 个情景对第 j 个资产的冲击为 market[s] + deltas[s, j]：
+    market 为各情景的市场整体冲击，deltas 为相对市场冲击的偏离
+    （行业/个股覆盖与历史情景），以 CSR 稀疏矩阵保存。假设情景
+    通常只涉及少数行业，稀疏存储使数千情景 × 数千资产也只占很少内存；
+    组合损益只需一次稀疏矩阵乘法。
+    """
+
+    def __init__(self, names, kinds, tickers, market, deltas):
+        self.names = list(names)
+        self.kinds = list(kinds)
+        self.tickers = list(tickers)
+        self.market = np.asarray(market, dtype=np.float64)
+        self.deltas = sparse.csr_matrix(deltas, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.names)
+
+    def concat(self, other):
+        """合并两组针对同一资产列表的情景"""
+        if other.tickers != self.tickers:
+            raise ValueError("情景的资产列表不一致")
+        return ScenarioSet(self.names + other.names, self.kinds + other.kinds, self.tickers,
+                           np.concatenate([self.market, other.market]),
+                           sparse.vstack([self.deltas, other.deltas], format='csr'))
+
+    def to_dense(self):
+        """返回 (情景数, 资产数) 的完整冲击矩阵"""
+        return pd.DataFrame(self.deltas.toarray() + self.market[:, None],
+                            index=self.names, columns=self.tickers)
+
+def compile_hypothetical(tickers, scenarios=None, sectors=None):
+    """将假设情景定义编译为 ScenarioSet
+
+    scenarios 为 {名称: {'market': x, 'sectors': {行业: x}, 'assets': {代码: x}}}，
+    优先级为 个股 > 行业 > 市场。默认使用 STRESS_CONFIG['hypothetical']。
+    """
+    scenarios = STRESS_CONFIG['hypothetical'] if scenarios is None else scenarios
+    sectors = STRESS_CONFIG['sectors'] if sectors is None else sectors
+    tickers = list(tickers)
+    position = {t: j for j, t in enumerate(tickers)}
+
+    # 行业 -> 资产列下标
+    members = {}
+    for j, ticker in enumerate(tickers):
+        members.setdefault(sectors.get(ticker, DEFAULT_SECTOR), []).append(j)
+    members = {k: np.array(v, dtype=np.int64) for k, v in members.items()}
+
+    market = np.zeros(len(scenarios))
+    rows, cols, vals = [], [], []
+    for s, spec in enumerate(scenarios.values()):
+        market[s] = spec.get('market', 0.0)
+        # 先行业后个股依次排列，同一资产保留最后出现的冲击（即优先级最高者）
+        idx = [members[k] for k in spec.get('sectors', {}) if k in members]
+        val = [np.full(len(members[k]), v) for k, v in spec.get('sectors', {}).items() if k in members]
+        assets = [(position[t], v) for t, v in spec.get('assets', {}).items() if t in position]
+        if assets:
+            idx.append(np.array([j for j, _ in assets], dtype=np.int64))
+            val.append(np.array([v for _, v in assets], dtype=np.float64))
+        if idx:
+            idx, val = np.concatenate(idx), np.concatenate(val)
+            _, last = np.unique(idx[::-1], return_index=True)
+            keep = len(idx) - 1 - last
+            rows.append(np.full(len(keep), s))
+            cols.append(idx[keep])
+            vals.append(val[keep] - market[s])
+
+    shape = (len(scenarios), len(tickers))
+    if rows:
+        deltas = sparse.csr_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))), shape=shape)
+    else:
+        deltas = sparse.csr_matrix(shape)
+    return ScenarioSet(scenarios.keys(), ['假设'] * len(scenarios), tickers, market, deltas)
+
+def compile_historical(returns, windows=None):
+    """由历史收益率（(T, N) DataFrame，日期索引）编译历史情景
+
+    每个情景的冲击为区间内各资产的累计收益率。所有区间通过累计净值
+    上的二分查找一次算出；数据未覆盖的区间被跳过，区间内缺失的资产冲击记为0。
+    默认使用 STRESS_CONFIG['historical']。
+    """
+    windows = STRESS_CONFIG['historical'] if windows is None else windows
+    frame = returns.to_frame() if isinstance(returns, pd.Series) else returns
+    values = np.nan_to_num(frame.to_numpy(dtype=np.float64))
+    # 净值前补一行1，使区间 [lo, hi) 的累计收益为 wealth[hi] / wealth[lo] - 1
+    wealth = np.vstack([np.ones((1, values.shape[1])), np.cumprod(1 + values, axis=0)])
+    dates = frame.index.values.astype('datetime64[ns]')
+
+    names, lo, hi = [], [], []
+    for name, (start, end) in windows.items():
+        start, end = np.datetime64(pd.Timestamp(start), 'ns'), np.datetime64(pd.Timestamp(end), 'ns')
+        a = int(np.searchsorted(dates, start, side='left'))
+        b = int(np.searchsorted(dates, end, side='right'))
+        # 只保留数据完整覆盖起始日的区间
+        if len(dates) and dates[0] <= start and a < b:
+            names.append(name)
+            lo.append(a)
+            hi.append(b)
+
+    shocks = wealth[hi] / wealth[lo] - 1 if names else np.zeros((0, values.shape[1]))
+    return ScenarioSet(names, ['历史'] * len(names), frame.columns, np.zeros(len(names)), shocks)
+
+def run_stress(scenarios, weights, portfolio_value=1.0):
+    """对一组或多组权重执行全部情景
+
+    weights 为长度为资产数的向量（或 {代码: 权重}），或 (资产数, 组合数) 矩阵。
+    返回以情景为行的 DataFrame：单个组合时列为 类型/组合收益率/损益，
+    多个组合时每列为一个组合的收益率。
+    """
+    if isinstance(weights, dict):
+        weights = np.array([weights.get(t, 0.0) for t in scenarios.tickers])
+    w = np.asarray(weights, dtype=np.float64)
+    single = w.ndim == 1
+    w = w.reshape(len(scenarios.tickers), -1)
+
+    # 组合收益 = 市场冲击 × 权重之和 + 偏离矩阵 · 权重
+    pnl = np.outer(scenarios.market, w.sum(axis=0)) + scenarios.deltas @ w
+    if not single:
+        return pd.DataFrame(pnl, index=scenarios.names)
+    return pd.DataFrame({
+        '类型': scenarios.kinds,
+        '组合收益率': pnl[:, 0],
+        '损益': pnl[:, 0] * portfolio_value,
+    }, index=scenarios.names)
+
+def scenario_contributions(scenarios, weights, names=None):
+    """各资产对选定情景损益的贡献（情景 × 资产），names 为空时取全部情景"""
+    if isinstance(weights, dict):
+        weights = np.array([weights.get(t, 0.0) for t in scenarios.tickers])
+    w = np.asarray(weights, dtype=np.float64)
+    rows = np.arange(len(scenarios)) if names is None else np.array([scenarios.names.index(n) for n in names])
+    shocks = scenarios.deltas[rows].toarray() + scenarios.market[rows, None]
+    return pd.DataFrame(shocks * w, index=[scenarios.names[i] for i in rows], columns=scenarios.tickers)
+
+def stress_test(returns, weights, hypothetical=None, windows=None, sectors=None, portfolio_value=1.0):
+    """编译默认（或给定的）历史与假设情景并对组合执行压力测试"""
+    frame = returns.to_frame() if isinstance(returns, pd.Series) else returns
+    scenarios = compile_historical(frame, windows).concat(
+        compile_hypothetical(frame.columns, hypothetical, sectors))
+    return run_stress(scenarios, weights, portfolio_value)
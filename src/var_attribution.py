@@ -0,0 +1,57 @@
+﻿# var_attribution.py - 参数法 VaR 的边际/成分/增量归因
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+def var_attribution(weights, cov, mean=None, confidence_level=0.95, tickers=None):
+    """基于协方差矩阵的组合 VaR 分解（正态参数法，口径与风险页一致：亏损为负）
+
+    组合 VaR = μ_p + z·σ_p，z 为标准正态的 (1-置信水平) 分位数。
+    只需一次矩阵-向量乘积 Σw，其余均为 O(N) 向量运算：
+      - 边际 VaR：∂VaR/∂w_i = μ_i + z·(Σw)_i / σ_p
+      - 成分 VaR：w_i × 边际 VaR，各成分之和等于组合 VaR（欧拉分解）
+      - 增量 VaR：组合 VaR 减去移除该头寸后的 VaR，移除后的方差为
+        σ_p² - 2w_i(Σw)_i + w_i²Σ_ii，无需对每个头寸重新计算
+      - 波动贡献：w_i(Σw)_i / σ_p，各项之和等于组合波动率
+
+    返回 (汇总字典, 以头寸为行的 DataFrame)。
+    """
+    w = np.asarray(weights, dtype=np.float64)
+    cov = np.asarray(cov, dtype=np.float64)
+    mu = np.zeros(len(w)) if mean is None else np.asarray(mean, dtype=np.float64)
+    z = stats.norm.ppf(1 - confidence_level)
+
+    sigma_w = cov @ w
+    variance = float(w @ sigma_w)
+    sigma_p = np.sqrt(max(variance, 0.0))
+    mu_p = float(w @ mu)
+    var_p = mu_p + z * sigma_p
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vol_contribution = np.where(sigma_p > 0, w * sigma_w / sigma_p, 0.0)
+        marginal = mu + z * np.where(sigma_p > 0, sigma_w / sigma_p, 0.0)
+    component = w * marginal
+
+    # 移除第 i 个头寸后的组合
+    variance_without = np.maximum(variance - 2 * w * sigma_w + w * w * np.diag(cov), 0.0)
+    var_without = (mu_p - w * mu) + z * np.sqrt(variance_without)
+    incremental = var_p - var_without
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        detail = pd.DataFrame({
+            'weight': w,
+            'marginal_var': marginal,
+            'component_var': component,
+            'component_pct': component / var_p if var_p != 0 else np.nan,
+            'incremental_var': incremental,
+            'vol_contribution': vol_contribution,
+            'vol_pct': vol_contribution / sigma_p if sigma_p > 0 else np.nan,
+        }, index=tickers)
+
+    summary = {
+        'var': var_p,
+        'volatility': sigma_p,
+        'mean': mu_p,
+        'confidence_level': confidence_level,
+    }
+    return summary, detail
@@ -0,0 +1,93 @@
+﻿# var_backtest.py - VaR 例外回测（Kupiec / Christoffersen / 交通灯）
+import numpy as np
+import pandas as pd
+from scipy import stats
+from scipy.special import xlogy
+
+from config import RISK_CONFIG
+from src.risk_metrics import rolling_var_cvar
+
+# 巴塞尔交通灯：例外次数的二项累积概率低于第一个阈值为绿区，低于第二个为黄区，否则为红区
+TRAFFIC_LIGHT = (0.95, 0.9999)
+ZONES = np.array(['绿', '黄', '红'])
+
+def _bernoulli_loglik(failures, successes, prob):
+    """failures 次概率为 prob、successes 次概率为 1-prob 的对数似然（0·log0 记为0）"""
+    return xlogy(failures, prob) + xlogy(successes, 1 - prob)
+
+def exception_tests(exceptions, valid, confidence_level):
+    """由例外矩阵 (天数, 列数) 计算各列的回测统计量
+
+    valid 标记有 VaR 预测的位置。Kupiec POF 检验例外频率，
+    Christoffersen 独立性检验相邻两日例外的转移概率，条件覆盖为两者之和。
+    """
+    p = 1 - confidence_level
+    hit = exceptions & valid
+    n = valid.sum(axis=0)
+    x = hit.sum(axis=0)
+    rate = np.where(n > 0, x / np.maximum(n, 1), 0.0)
+
+    # Kupiec POF：H0 例外概率为 p
+    lr_pof = -2 * (_bernoulli_loglik(x, n - x, p) - _bernoulli_loglik(x, n - x, rate))
+
+    # Christoffersen 独立性：相邻两个有效日的状态转移计数
+    pair = valid[1:] & valid[:-1]
+    prev, curr = hit[:-1], hit[1:]
+    n00 = (pair & ~prev & ~curr).sum(axis=0)
+    n01 = (pair & ~prev & curr).sum(axis=0)
+    n10 = (pair & prev & ~curr).sum(axis=0)
+    n11 = (pair & prev & curr).sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pi0 = np.where(n00 + n01 > 0, n01 / (n00 + n01), 0.0)
+        pi1 = np.where(n10 + n11 > 0, n11 / (n10 + n11), 0.0)
+        pi = np.where(n00 + n01 + n10 + n11 > 0, (n01 + n11) / (n00 + n01 + n10 + n11), 0.0)
+    lr_ind = -2 * (_bernoulli_loglik(n01 + n11, n00 + n10, pi)
+                   - _bernoulli_loglik(n01, n00, pi0) - _bernoulli_loglik(n11, n10, pi1))
+    lr_ind = np.maximum(lr_ind, 0.0)
+    lr_cc = lr_pof + lr_ind
+
+    # 交通灯分区
+    cdf = stats.binom.cdf(x, n, p)
+    zone = ZONES[np.searchsorted(TRAFFIC_LIGHT, cdf, side='right')]
+
+    return {
+        'observations': n,
+        'exceptions': x,
+        'expected': n * p,
+        'exception_rate': rate,
+        'kupiec_lr': lr_pof,
+        'kupiec_pvalue': stats.chi2.sf(lr_pof, 1),
+        'independence_lr': lr_ind,
+        'independence_pvalue': stats.chi2.sf(lr_ind, 1),
+        'cc_lr': lr_cc,
+        'cc_pvalue': stats.chi2.sf(lr_cc, 2),
+        'zone': zone,
+    }
+
+def var_backtest(returns, window=None, confidence_level=0.99, test_days=250):
+    """对 (T, N) 收益率做滚动历史模拟 VaR 的例外回测
+
+    第 t 日的 VaR 由截至 t-1 日的 window 天收益率按 calculate_risk_metrics
+    的口径计算（复用 rolling_var_cvar 的排名树，窗口滑动时增量更新），
+    当日收益率低于该 VaR 记为一次例外。只取最近 test_days 个交易日
+    （为 0 或 None 时回测全部有预测的交易日）。
+
+    返回 (以资产为行的统计量 DataFrame, 例外矩阵 DataFrame, VaR 预测 DataFrame)。
+    """
+    window = window or RISK_CONFIG['default_window']
+    frame = returns.to_frame() if isinstance(returns, pd.Series) else returns
+    if test_days:
+        # 只需保留最后 test_days 个预测所用的数据
+        frame = frame.iloc[-(test_days + window):]
+
+    var, _ = rolling_var_cvar(frame, window, confidence_level)
+    forecast = var.shift(1)
+    if test_days:
+        forecast = forecast.iloc[-test_days:]
+    realised = frame.loc[forecast.index]
+
+    valid = forecast.notna().to_numpy() & realised.notna().to_numpy()
+    exceptions = realised.to_numpy() < forecast.to_numpy()
+    results = pd.DataFrame(exception_tests(exceptions, valid, confidence_level), index=frame.columns)
+    exceptions = pd.DataFrame(exceptions & valid, index=forecast.index, columns=frame.columns)
+    return results, exceptions, forecast
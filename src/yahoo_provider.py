@@ -0,0 +1,116 @@
+﻿# yahoo_provider.py - Yahoo Finance 批量数据源
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import requests
+
+from config import API_CONFIG
+
+class ProviderError(Exception):
+    """数据源请求失败（重试耗尽或返回内容无效）"""
+
+class YahooFinanceProvider:
+    """通过 Yahoo Finance chart 接口并发获取日线OHLCV
+
+    代码按 batch_size 分批，每批由线程池中的一个工作线程通过同一个
+    keep-alive 连接依次请求，最多 max_workers 批同时进行。
+    超时、重试次数和退避间隔取自 API_CONFIG['yfinance']；
+    base_url 可指向本地替身服务器用于测试。
+    """
+
+    name = 'yfinance'
+
+    def __init__(self, base_url=None, max_workers=None, batch_size=None,
+                 max_retries=None, retry_delay=None, timeout=None):
+        config = API_CONFIG['yfinance']
+        self.base_url = (base_url or config['base_url']).rstrip('/')
+        self.max_workers = max_workers or config['max_workers']
+        self.batch_size = batch_size or config['batch_size']
+        self.max_retries = config['max_retries'] if max_retries is None else max_retries
+        self.retry_delay = config['retry_delay'] if retry_delay is None else retry_delay
+        self.timeout = config['timeout'] if timeout is None else timeout
+
+    def _request(self, session, ticker, period):
+        """请求单只股票，对网络错误、429和5xx按指数退避重试"""
+        url = f"{self.base_url}/v8/finance/chart/{requests.utils.quote(ticker, safe='')}"
+        params = {'range': period, 'interval': '1d', 'includePrePost': 'false'}
+        last_error = None
+
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                time.sleep(self.retry_delay * 2 ** (attempt - 1))
+            try:
+                response = session.get(url, params=params, timeout=self.timeout)
+            except requests.RequestException as e:
+                last_error = e
+                continue
+
+            if response.status_code == 429 or response.status_code >= 500:
+                last_error = ProviderError(f"{ticker}: HTTP {response.status_code}")
+                continue
+            if response.status_code != 200:
+                raise ProviderError(f"{ticker}: HTTP {response.status_code}")
+            try:
+                return response.json()
+            except ValueError as e:
+                raise ProviderError(f"{ticker}: 无效的响应内容") from e
+
+        raise ProviderError(f"{ticker}: 重试 {self.max_retries} 次后仍失败 ({last_error})")
+
+    def _parse(self, ticker, payload):
+        """将 chart 接口返回的 JSON 转换为OHLCV DataFrame"""
+        try:
+            result = payload['chart']['result'][0]
+            timestamps = result['timestamp']
+            quote = result['indicators']['quote'][0]
+        except (KeyError, IndexError, TypeError) as e:
+            raise ProviderError(f"{ticker}: 响应中没有价格数据") from e
+
+        dates = pd.to_datetime(np.asarray(timestamps, dtype=np.int64), unit='s').normalize()
+        data = pd.DataFrame({
+            field: np.asarray(quote.get(field.lower(), [None] * len(dates)), dtype=float)
+            for field in ['Open', 'High', 'Low', 'Close', 'Volume']
+        }, index=dates)
+
+        data = data[~data['Close'].isna()]
+        data = data[~data.index.duplicated(keep='last')].sort_index()
+        if data.empty:
+            raise ProviderError(f"{ticker}: 没有有效的价格数据")
+        data[['Open', 'High', 'Low']] = data[['Open', 'High', 'Low']].ffill().bfill()
+        data['Volume'] = data['Volume'].fillna(0).astype(np.int64)
+        return data
+
+    def _fetch_batch(self, tickers, period):
+        """在一个连接上依次获取一批代码，返回 ({代码: 数据}, {代码: 错误})"""
+        results, errors = {}, {}
+        with requests.Session() as session:
+            session.headers['User-Agent'] = 'Mozilla/5.0 (FinRisk Pro)'
+            for ticker in tickers:
+                try:
+                    results[ticker] = self._parse(ticker, self._request(session, ticker, period))
+                except ProviderError as e:
+                    errors[ticker] = e
+        return results, errors
+
+    def fetch_many(self, tickers, period="5y"):
+        """并发获取多只股票，返回 ({代码: 数据}, {代码: 错误})"""
+        tickers = list(dict.fromkeys(tickers))
+        batches = [tickers[i:i + self.batch_size] for i in range(0, len(tickers), self.batch_size)]
+        results, errors = {}, {}
+        if not batches:
+            return results, errors
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as pool:
+            for batch_results, batch_errors in pool.map(lambda b: self._fetch_batch(b, period), batches):
+                results.update(batch_results)
+                errors.update(batch_errors)
+        return results, errors
+
+    def fetch(self, ticker, period="5y"):
+        """获取单只股票，失败时抛出 ProviderError"""
+        results, errors = self._fetch_batch([ticker], period)
+        if ticker in errors:
+            raise errors[ticker]
+        return results[ticker]
@@ -55,34 +55,27 @@ def find_available_port(start_port=8502, max_attempts=10):
     return start_port + max_attempts
 
 def clear_cache(days_old=7):
-    """清除旧的缓存文件"""
-    import time
-    from pathlib import Path
-    
-    cache_dir = Path('./data/cache')
-    if not cache_dir.exists():
-        return
-    
-    current_time = time.time()
-    cutoff = current_time - (days_old * 24 * 60 * 60)
-    
-    deleted = 0
-    for file in cache_dir.glob('*.pkl'):
-        if file.stat().st_mtime < cutoff:
-            try:
-                file.unlink()
-                deleted += 1
-            except:
-                pass
-    
+    """清除旧的缓存文件（文件布局与过期规则由 PriceCache 负责）"""
+    from src.price_cache import PriceCache
+
+    deleted = PriceCache().clear(older_than=days_old * 24 * 60 * 60)
     if deleted > 0:
         print(f"🗑️  已清除 {deleted} 个旧缓存文件")
 
+def refresh_data():
+    """增量刷新数据存储中的全部股票"""
+    from src.data_manager import data_manager
+
+    added = data_manager.refresh()
+    total = sum(added.values())
+    print(f"🔄 已刷新 {len(added)} 只股票，新增 {total} 根K线")
+
 def main():
     parser = argparse.ArgumentParser(description='启动 FinRisk Pro')
     parser.add_argument('--port', type=int, help='指定端口号')
     parser.add_argument('--clear-cache', action='store_true', help='清除缓存')
     parser.add_argument('--no-browser', action='store_true', help='不自动打开浏览器')
+    parser.add_argument('--refresh-data', action='store_true', help='增量刷新已存储的行情数据后退出')
     args = parser.parse_args()
     
     print("=" * 50)
@@ -97,6 +90,11 @@ def main():
     if not setup_environment():
         print("❌ 环境设置失败")
         return
+
+    # 增量刷新数据（如需要）
+    if args.refresh_data:
+        refresh_data()
+        return
     
     # 查找可用端口
     port = args.port if args.port else find_available_port()
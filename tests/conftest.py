@@ -0,0 +1,6 @@
+# conftest.py - 测试公共设置
+import sys
+from pathlib import Path
+
+# 与页面相同，从项目根目录导入 config 和 src
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
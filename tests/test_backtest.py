@@ -0,0 +1,68 @@
+# test_backtest.py - (N, K) 向量化回测与逐策略循环的一致性
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.backtest import make_configs, rebalance_schedule, run_backtest
+
+@pytest.fixture
+def returns():
+    rng = np.random.default_rng(0)
+    index = pd.bdate_range('2022-01-03', periods=400)
+    return pd.DataFrame(rng.normal(3e-4, 0.015, (400, 5)), index=index, columns=list('ABCDE'))
+
+def single_strategy(returns, weights, config, cash_rate=0.02):
+    """逐日标量循环回测单个策略"""
+    values = returns.to_numpy()
+    schedule = rebalance_schedule(returns.index, config['rebalance'])
+    daily_cash = (1 + cash_rate) ** (1 / 252) - 1
+    threshold = np.inf if config['threshold'] is None else config['threshold']
+    target = np.asarray(weights) / np.sum(weights) * (1 - config['cash'])
+    h, value, nav, turnover = target.copy(), 1.0, [], []
+    for t in range(len(values)):
+        grown = h * (1 + values[t])
+        growth = grown.sum() + (1 - h.sum()) * (1 + daily_cash)
+        value *= growth
+        h = grown / growth
+        trade = 0.0
+        if schedule[t] or np.abs(h - target).max() > threshold:
+            trade = np.abs(target - h).sum()
+            value *= 1 - trade * config['cost_bps'] / 1e4
+            h = target.copy()
+        nav.append(value)
+        turnover.append(trade)
+    return np.array(nav), np.array(turnover)
+
+def test_matches_per_strategy_loop(returns):
+    weights = np.array([0.4, 0.25, 0.15, 0.1, 0.1])
+    configs = make_configs(rebalance=(None, 'M', 'Q', 10), threshold=(None, 0.02),
+                           cost_bps=(0.0, 25.0), cash=(0.0, 0.1))
+    result = run_backtest(returns, weights, configs, cash_rate=0.02)
+    assert result.nav.shape == (len(returns), len(configs))
+    for k, config in enumerate(configs):
+        nav, turnover = single_strategy(returns, weights, config)
+        np.testing.assert_allclose(result.nav[:, k], nav, rtol=1e-13)
+        np.testing.assert_allclose(result.turnover[:, k], turnover, rtol=1e-13, atol=1e-16)
+
+def test_buy_and_hold_and_daily_rebalance(returns):
+    weights = {'A': 0.2, 'B': 0.2, 'C': 0.2, 'D': 0.2, 'E': 0.2}
+    configs = [{'name': '持有', 'rebalance': None}, {'name': '每日', 'rebalance': 1}]
+    nav = run_backtest(returns, weights, configs).nav_frame()
+    w = np.full(5, 0.2)
+    np.testing.assert_allclose(nav['持有'], (np.cumprod(1 + returns.to_numpy(), axis=0) * w).sum(axis=1), rtol=1e-12)
+    np.testing.assert_allclose(nav['每日'], np.cumprod(1 + returns.to_numpy() @ w), rtol=1e-12)
+
+def test_summary_counts(returns):
+    configs = make_configs(rebalance=(None, 'M'), cost_bps=(10.0,))
+    summary = run_backtest(returns, np.full(5, 0.2), configs).summary()
+    assert summary['rebalances'].iloc[0] == 0 and summary['total_cost'].iloc[0] == 0
+    # 每个完整月份的最后一个交易日再平衡一次（最后一个月未结束）
+    months = returns.index.to_period('M').nunique()
+    assert summary['rebalances'].iloc[1] == months - 1
+
+def test_calendar_schedule_marks_period_ends():
+    index = pd.bdate_range('2024-01-01', '2024-03-31')
+    flags = rebalance_schedule(index, 'M')
+    assert list(index[flags]) == [pd.Timestamp('2024-01-31'), pd.Timestamp('2024-02-29')]
+    with pytest.raises(ValueError):
+        rebalance_schedule(index, 'H')
@@ -0,0 +1,41 @@
+# test_covariance.py - 协方差服务的缓存与增量更新
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.covariance import CovarianceService, ewma_covariance
+
+@pytest.fixture
+def returns():
+    rng = np.random.default_rng(0)
+    index = pd.bdate_range('2024-01-02', periods=120)
+    return pd.DataFrame(rng.normal(0, 0.01, (120, 4)), index=index, columns=['A', 'B', 'C', 'D'])
+
+@pytest.mark.parametrize('step', [1, 3, 19])
+def test_ewma_incremental_matches_full_window(returns, step):
+    service = CovarianceService()
+    window = 20
+    end = 60
+    service.get(returns.iloc[:end], 'ewma', window=window)
+    while end + step <= len(returns):
+        end += step
+        mean, cov = service.get(returns.iloc[:end], 'ewma', window=window)
+        ref_mean, ref_cov = ewma_covariance(returns.iloc[end - window:end].to_numpy())
+        np.testing.assert_allclose(mean, ref_mean, rtol=1e-9, atol=1e-15)
+        np.testing.assert_allclose(cov, ref_cov, rtol=1e-9, atol=1e-15)
+
+def test_ewma_result_independent_of_cache_history(returns):
+    seeded = CovarianceService()
+    seeded.get(returns.iloc[:-1], 'ewma', window=20)
+    fresh = CovarianceService()
+    np.testing.assert_allclose(seeded.get(returns, 'ewma', window=20)[1],
+                               fresh.get(returns, 'ewma', window=20)[1], rtol=1e-9)
+
+def test_same_name_different_data_not_shared(returns):
+    service = CovarianceService()
+    a = returns['A'].rename(0)
+    b = (returns['B'] * 2).rename(0)
+    for method in ('sample', 'ewma', 'ledoit_wolf'):
+        cov_a = service.get(a, method, window=60)[1]
+        cov_b = service.get(b, method, window=60)[1]
+        assert not np.allclose(cov_a, cov_b)
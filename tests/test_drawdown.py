@@ -0,0 +1,72 @@
+# test_drawdown.py - 回撤分析与逐行循环的一致性
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.drawdown import drawdown_stats
+
+def brute_force(returns):
+    """逐行维护运行最高净值，返回 (回撤序列, 回撤区间列表)
+
+    峰值为已出现净值的最大值（不含期初净值1），区间记为
+    (深度, 峰值行, 谷底行, 恢复行)，净值重新达到峰值的行为恢复行，未恢复时为 -1。
+    """
+    wealth, peak, peak_row = 1.0, -np.inf, 0
+    drawdowns, episodes, current = [], [], None
+    for t, r in enumerate(returns):
+        wealth *= 1 + r
+        if wealth >= peak:
+            if current is not None:
+                episodes.append(current + [t])
+                current = None
+            peak, peak_row = wealth, t
+            drawdowns.append(0.0)
+            continue
+        dd = wealth / peak - 1
+        drawdowns.append(dd)
+        if current is None:
+            current = [dd, peak_row, t]
+        elif dd < current[0]:
+            current[0], current[2] = dd, t
+    if current is not None:
+        episodes.append(current + [-1])
+    return np.array(drawdowns), sorted(episodes, key=lambda e: (e[0], e[1]))
+
+@pytest.mark.parametrize('seed', range(5))
+def test_matches_running_max_loop(seed):
+    rng = np.random.default_rng(seed)
+    # 零均值使每列都有较多回撤区间
+    returns = rng.normal(0.0, 0.01, (400, 3))
+    stats = drawdown_stats(returns, top_k=5)
+    for j in range(returns.shape[1]):
+        dd, episodes = brute_force(returns[:, j])
+        top = episodes[:5]
+        k = len(top)
+        assert stats.max_drawdown[j] == pytest.approx(top[0][0], abs=1e-14)
+        assert stats.current_drawdown[j] == pytest.approx(dd[-1], abs=1e-14)
+        assert stats.time_under_water[j] == pytest.approx((dd < 0).mean())
+        np.testing.assert_allclose(stats.episode_depth[j][:k], [e[0] for e in top], rtol=0, atol=1e-14)
+        np.testing.assert_array_equal(stats.episode_peak[j][:k], [e[1] for e in top])
+        np.testing.assert_array_equal(stats.episode_trough[j][:k], [e[2] for e in top])
+        np.testing.assert_array_equal(stats.episode_recovery[j][:k], [e[3] for e in top])
+        assert (stats.episode_peak[j][k:] == -1).all()
+
+def test_top_k_larger_than_episode_count():
+    # 两个回撤区间：第二个未恢复
+    returns = pd.Series([0.1, -0.2, 0.3, 0.05, -0.1, 0.02], index=pd.bdate_range('2024-01-01', periods=6))
+    stats = drawdown_stats(returns, top_k=5)
+    _, episodes = brute_force(returns.to_numpy())
+    assert len(episodes) == 2
+    found = stats.episodes()
+    assert len(found) == 2
+    np.testing.assert_allclose(found['depth'], [e[0] for e in episodes], rtol=0, atol=1e-14)
+    assert pd.isna(found['recovery_date'].iloc[1])
+    # 不足 k 个时补齐的位置为 -1、深度为 0
+    assert (stats.episode_peak[0][2:] == -1).all() and (stats.episode_depth[0][2:] == 0).all()
+
+@pytest.mark.parametrize('returns', [np.array([]), np.array([0.01]), pd.DataFrame(np.zeros((1, 3)))])
+def test_short_input_returns_empty(returns):
+    stats = drawdown_stats(returns)
+    assert (stats.max_drawdown == 0).all()
+    assert stats.episodes().empty
+    assert len(stats.summary()) == stats.episode_depth.shape[0]
@@ -0,0 +1,32 @@
+# test_garch.py - GARCH 参数缓存
+import numpy as np
+import pandas as pd
+
+from src.garch import GarchParamCache, fit_garch
+
+def garch_series(seed, omega, alpha, beta, n=600):
+    rng = np.random.default_rng(seed)
+    r = np.empty(n)
+    var = omega / (1 - alpha - beta)
+    for t in range(n):
+        r[t] = np.sqrt(var) * rng.standard_normal()
+        var = omega + alpha * r[t] ** 2 + beta * var
+    return pd.Series(r, index=pd.bdate_range('2022-01-03', periods=n), name='X')
+
+def test_cache_reuses_identical_window():
+    cache = GarchParamCache()
+    series = garch_series(0, 2e-6, 0.08, 0.9)
+    first = cache.fit(series, window=500)
+    second = cache.fit(series.copy(), window=500)
+    pd.testing.assert_frame_equal(first, second)
+
+def test_cache_refits_same_name_and_date_with_different_data():
+    cache = GarchParamCache()
+    calm = garch_series(0, 2e-6, 0.08, 0.9)
+    wild = garch_series(1, 2e-5, 0.15, 0.8)
+    cache.fit(calm, window=500)
+    cached = cache.fit(wild, window=500)
+    direct = fit_garch(wild.iloc[-500:].to_frame())
+    np.testing.assert_allclose(cached[['omega', 'alpha', 'beta']].to_numpy(),
+                               direct[['omega', 'alpha', 'beta']].to_numpy(), rtol=1e-2, atol=1e-6)
+    assert cached.loc['X', 'sigma'] != cache.fit(calm, window=500).loc['X', 'sigma']
@@ -0,0 +1,52 @@
+# test_monte_carlo.py - 流式分位数累加器与蒙特卡洛 VaR 的正确性
+import numpy as np
+import pytest
+from scipy import stats
+
+from src.monte_carlo import TailAccumulator, monte_carlo_var
+
+def test_accumulator_matches_exact_quantile():
+    rng = np.random.default_rng(0)
+    values = rng.standard_t(4, 200_000) * 0.01
+    sd = values.std()
+    acc = TailAccumulator(-40 * sd, 40 * sd)
+    for chunk in np.array_split(values, 7):
+        acc.add(chunk)
+    ordered = np.sort(values)
+    for q in (0.001, 0.01, 0.05):
+        exact = np.quantile(values, q)
+        var, cvar = acc.quantile_and_tail(q)
+        # 稀疏尾部的桶内没有相邻样本的位置信息，只保证落在两侧次序统计量之间
+        pos = q * (len(values) - 1)
+        lower, upper = ordered[int(np.floor(pos))], ordered[int(np.ceil(pos))]
+        assert lower - acc.width <= var <= upper + acc.width
+        assert cvar == pytest.approx(values[values <= exact].mean(), rel=1e-3)
+    assert acc.mean() == pytest.approx(values.mean())
+    assert acc.std() == pytest.approx(values.std(ddof=1))
+
+def test_normal_closed_form():
+    rng = np.random.default_rng(1)
+    a = rng.normal(size=(4, 4))
+    cov = (a @ a.T + np.eye(4)) * 1e-4
+    mean = np.full(4, 5e-4)
+    weights = np.array([0.4, 0.3, 0.2, 0.1])
+    result = monte_carlo_var(mean, cov, weights, (0.95, 0.99), n_paths=1_000_000, n_workers=1)
+    mu, sd = weights @ mean, np.sqrt(weights @ cov @ weights)
+    for level in (0.95, 0.99):
+        z = stats.norm.ppf(1 - level)
+        # 分位数的抽样标准误约为 sqrt(q(1-q)/n)/pdf(z)*sd，这里容忍约 5 倍
+        tol = 5 * np.sqrt(level * (1 - level) / 1e6) / stats.norm.pdf(z) * sd
+        assert result['var'][level] == pytest.approx(mu + z * sd, abs=tol)
+        assert result['cvar'][level] == pytest.approx(mu - sd * stats.norm.pdf(z) / (1 - level), abs=2 * tol)
+    assert result['n_paths'] == 1_000_000
+
+def test_independent_of_worker_count():
+    cov = np.array([[4e-4, 1e-4], [1e-4, 2e-4]])
+    kwargs = dict(confidence_levels=(0.99,), n_paths=600_000, df=5, seed=7)
+    serial = monte_carlo_var(np.zeros(2), cov, **kwargs, n_workers=1)
+    parallel = monte_carlo_var(np.zeros(2), cov, **kwargs, n_workers=2)
+    assert serial == parallel
+
+def test_rejects_small_dof():
+    with pytest.raises(ValueError):
+        monte_carlo_var([0.0], [[1e-4]], df=2)
@@ -0,0 +1,58 @@
+# test_optimizer.py - 积极集法与 SLSQP 的一致性
+import numpy as np
+import pytest
+from scipy.optimize import minimize
+
+from src.optimizer import MeanVarianceOptimizer
+
+def random_problem(seed, n=12):
+    rng = np.random.default_rng(seed)
+    factors = rng.normal(0, 0.01, (n, 3))
+    cov = factors @ factors.T + np.diag(rng.uniform(1e-5, 4e-4, n))
+    mean = rng.normal(4e-4, 3e-4, n)
+    return mean, cov
+
+def slsqp(objective, n, lower, upper):
+    result = minimize(objective, np.full(n, 1.0 / n), method='SLSQP',
+                      bounds=[(lower, upper)] * n,
+                      constraints=[{'type': 'eq', 'fun': lambda w: w.sum() - 1}],
+                      options={'ftol': 1e-15, 'maxiter': 1000})
+    assert result.success
+    return result.x
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('upper', [1.0, 0.25])
+@pytest.mark.parametrize('lam', [0.0, 0.05, 0.5])
+def test_solve_matches_slsqp(seed, upper, lam):
+    mean, cov = random_problem(seed)
+    optimizer = MeanVarianceOptimizer(mean, cov, bounds=(0.0, upper))
+    # solve(λ) 最小化 ½w'Σw - λμ'w（Σ、μ 为年化值）
+    sigma, mu = optimizer.cov, optimizer.mean
+
+    def objective(w):
+        return 0.5 * w @ sigma @ w - lam * mu @ w
+
+    w = optimizer.solve(lam)
+    reference = slsqp(objective, len(mean), 0.0, upper)
+    assert abs(w.sum() - 1) < 1e-12
+    assert (w >= -1e-12).all() and (w <= upper + 1e-12).all()
+    assert objective(w) <= objective(reference) + 1e-10
+    np.testing.assert_allclose(w, reference, atol=1e-4)
+
+def test_max_sharpe_matches_slsqp():
+    mean, cov = random_problem(7)
+    optimizer = MeanVarianceOptimizer(mean, cov, bounds=(0.0, 0.4), risk_free_rate=0.02)
+
+    def negative_sharpe(w):
+        return -optimizer.portfolio_stats(w)[2]
+
+    w = np.asarray(optimizer.max_sharpe())
+    reference = slsqp(negative_sharpe, len(mean), 0.0, 0.4)
+    assert optimizer.portfolio_stats(w)[2] >= -negative_sharpe(reference) - 1e-6
+
+def test_frontier_is_monotone():
+    mean, cov = random_problem(3, n=30)
+    frontier, weights = MeanVarianceOptimizer(mean, cov, bounds=(0.0, 0.2)).efficient_frontier(40)
+    assert np.all(np.diff(frontier['return']) >= -1e-12)
+    assert np.all(np.diff(frontier['volatility']) >= -1e-9)
+    np.testing.assert_allclose(np.asarray(weights).sum(axis=1), 1.0, atol=1e-12)
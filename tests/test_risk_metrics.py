@@ -0,0 +1,58 @@
+# test_risk_metrics.py - 滚动 VaR/CVaR 与逐窗口计算的一致性
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.risk_metrics import batch_risk_metrics, calculate_risk_metrics, rolling_var_cvar
+
+def reference(returns, window, confidence_level):
+    """逐窗口调用 calculate_risk_metrics（忽略缺失值）"""
+    rows = []
+    for t in range(window - 1, len(returns)):
+        metrics = calculate_risk_metrics(returns.iloc[t - window + 1:t + 1].dropna(), confidence_level)
+        rows.append((metrics.get('var', np.nan), metrics.get('cvar', np.nan)))
+    return np.array(rows)
+
+@pytest.mark.parametrize('confidence_level', [0.9, 0.95, 0.99])
+def test_rolling_matches_reference_with_ties(confidence_level):
+    rng = np.random.default_rng(0)
+    returns = pd.Series(rng.normal(0, 0.012, 300))
+    # 15% 的收益率恰好等于 -1%：与 VaR 相等的重复值须全部计入 CVaR
+    returns[rng.random(300) < 0.15] = -0.01
+    result = rolling_var_cvar(returns, 100, confidence_level).iloc[99:].to_numpy()
+    np.testing.assert_allclose(result, reference(returns, 100, confidence_level), rtol=0, atol=1e-15)
+
+def test_rolling_ignores_nan():
+    rng = np.random.default_rng(1)
+    # 价格精度的收益率（大量重复值）加上零散及整段缺失
+    returns = pd.Series(np.round(rng.normal(0, 0.01, 400), 3))
+    returns[rng.random(400) < 0.2] = np.nan
+    returns[50:160] = np.nan
+    result = rolling_var_cvar(returns, 60, 0.9).iloc[59:].to_numpy()
+    np.testing.assert_allclose(result, reference(returns, 60, 0.9), rtol=0, atol=1e-15)
+
+def test_rolling_all_nan_window():
+    returns = pd.Series(np.r_[np.full(30, np.nan), np.linspace(-0.02, 0.02, 30)])
+    result = rolling_var_cvar(returns, 20, 0.95)
+    assert result.iloc[19:30].isna().all().all()
+    assert result.iloc[49].notna().all()
+
+def test_rolling_frame_matches_series():
+    rng = np.random.default_rng(2)
+    frame = pd.DataFrame(np.round(rng.normal(0, 0.01, (200, 3)), 3), columns=['A', 'B', 'C'])
+    frame.iloc[rng.random((200, 3)) < 0.1] = np.nan
+    var, cvar = rolling_var_cvar(frame, 50, 0.95)
+    for column in frame.columns:
+        single = rolling_var_cvar(frame[column], 50, 0.95)
+        np.testing.assert_array_equal(var[column].to_numpy(), single['var'].to_numpy())
+        np.testing.assert_array_equal(cvar[column].to_numpy(), single['cvar'].to_numpy())
+
+def test_batch_matches_reference_with_ties():
+    rng = np.random.default_rng(3)
+    returns = pd.Series(np.round(rng.normal(0, 0.01, 500), 3))
+    returns[rng.random(500) < 0.1] = np.nan
+    batch = batch_risk_metrics(returns.rename('X'), (0.9, 0.95)).loc['X']
+    for level, label in [(0.9, '90'), (0.95, '95')]:
+        metrics = calculate_risk_metrics(returns.dropna(), level)
+        assert batch[f'var_{label}'] == pytest.approx(metrics['var'], abs=1e-15)
+        assert batch[f'cvar_{label}'] == pytest.approx(metrics['cvar'], abs=1e-15)
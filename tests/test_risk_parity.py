@@ -0,0 +1,35 @@
+# test_risk_parity.py - 风险平价组合的风险贡献
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.risk_parity import risk_contributions, risk_parity
+
+def random_cov(seed, n):
+    rng = np.random.default_rng(seed)
+    factors = rng.normal(0, 0.01, (n, 4))
+    return factors @ factors.T + np.diag(rng.uniform(1e-5, 4e-4, n))
+
+@pytest.mark.parametrize('n', [2, 10, 200])
+def test_equal_risk_contributions(n):
+    cov = random_cov(n, n)
+    w = risk_parity(cov)
+    assert w.sum() == pytest.approx(1.0)
+    assert (w > 0).all()
+    np.testing.assert_allclose(risk_contributions(w, cov), np.full(n, 1.0 / n), rtol=0, atol=1e-9)
+
+def test_custom_budgets():
+    cov = random_cov(1, 6)
+    budgets = np.array([3, 1, 1, 2, 2, 1], dtype=float)
+    w = risk_parity(cov, budgets=budgets)
+    np.testing.assert_allclose(risk_contributions(w, cov), budgets / budgets.sum(), rtol=0, atol=1e-9)
+
+def test_diagonal_cov_is_inverse_volatility():
+    vol = np.array([0.01, 0.02, 0.04])
+    w = risk_parity(np.diag(vol ** 2), tickers=['A', 'B', 'C'])
+    assert isinstance(w, pd.Series)
+    np.testing.assert_allclose(w.to_numpy(), (1 / vol) / (1 / vol).sum(), atol=1e-10)
+
+def test_rejects_non_positive_budgets():
+    with pytest.raises(ValueError):
+        risk_parity(random_cov(2, 3), budgets=[1, 0, 1])
@@ -0,0 +1,53 @@
+# test_stress_test.py - 稀疏情景矩阵与稠密计算的一致性
+import numpy as np
+import pandas as pd
+
+from src.stress_test import compile_historical, compile_hypothetical, run_stress, scenario_contributions
+
+TICKERS = ['AAPL', 'MSFT', 'JPM', 'SPY', 'BTC-USD', 'XYZ']
+SECTORS = {'AAPL': '科技', 'MSFT': '科技', 'JPM': '金融', 'SPY': '指数', 'BTC-USD': '加密货币'}
+SCENARIOS = {
+    '市场下跌': {'market': -0.10},
+    '科技股抛售': {'market': -0.05, 'sectors': {'科技': -0.25}},
+    '个股覆盖': {'market': -0.05, 'sectors': {'科技': -0.25}, 'assets': {'AAPL': -0.40, 'XYZ': 0.05}},
+    '加密货币崩盘': {'sectors': {'加密货币': -0.50}},
+}
+
+def test_hypothetical_shocks_follow_priority():
+    dense = compile_hypothetical(TICKERS, SCENARIOS, SECTORS).to_dense()
+    assert (dense.loc['市场下跌'] == -0.10).all()
+    assert dense.loc['科技股抛售', 'MSFT'] == -0.25 and dense.loc['科技股抛售', 'JPM'] == -0.05
+    # 个股 > 行业 > 市场
+    assert dense.loc['个股覆盖', 'AAPL'] == -0.40
+    assert dense.loc['个股覆盖', 'MSFT'] == -0.25
+    assert dense.loc['个股覆盖', 'XYZ'] == 0.05
+    assert dense.loc['加密货币崩盘', 'BTC-USD'] == -0.50 and dense.loc['加密货币崩盘', 'SPY'] == 0.0
+
+def test_sparse_pnl_equals_dense_product():
+    rng = np.random.default_rng(0)
+    index = pd.bdate_range('2022-01-03', periods=300)
+    returns = pd.DataFrame(rng.normal(0, 0.01, (300, len(TICKERS))), index=index, columns=TICKERS)
+    windows = {'一段': ('2022-02-01', '2022-03-15'), '另一段': ('2022-06-01', '2022-06-10'),
+               '超出范围': ('2021-01-01', '2021-02-01')}
+    scenarios = compile_hypothetical(TICKERS, SCENARIOS, SECTORS).concat(compile_historical(returns, windows))
+    dense = scenarios.to_dense().to_numpy()
+    assert len(scenarios) == len(SCENARIOS) + 2
+
+    weights = rng.dirichlet(np.ones(len(TICKERS)))
+    result = run_stress(scenarios, dict(zip(TICKERS, weights)), portfolio_value=1e6)
+    np.testing.assert_allclose(result['组合收益率'], dense @ weights, rtol=0, atol=1e-15)
+    np.testing.assert_allclose(result['损益'], dense @ weights * 1e6, rtol=1e-15)
+
+    many = rng.dirichlet(np.ones(len(TICKERS)), size=5).T
+    np.testing.assert_allclose(run_stress(scenarios, many).to_numpy(), dense @ many, rtol=0, atol=1e-15)
+
+    contributions = scenario_contributions(scenarios, weights)
+    np.testing.assert_allclose(np.asarray(contributions), dense * weights, rtol=0, atol=1e-15)
+
+def test_historical_shock_is_cumulative_return():
+    rng = np.random.default_rng(1)
+    index = pd.bdate_range('2023-01-02', periods=60)
+    returns = pd.DataFrame(rng.normal(0, 0.02, (60, 2)), index=index, columns=['A', 'B'])
+    scenarios = compile_historical(returns, {'区间': ('2023-01-10', '2023-02-03')})
+    expected = (1 + returns.loc['2023-01-10':'2023-02-03']).prod() - 1
+    np.testing.assert_allclose(scenarios.to_dense().loc['区间'], expected, rtol=1e-12)
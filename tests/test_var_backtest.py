@@ -0,0 +1,52 @@
+# test_var_backtest.py - VaR 例外回测与逐日计算的一致性
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.risk_metrics import calculate_risk_metrics
+from src.var_backtest import exception_tests, var_backtest
+
+@pytest.fixture
+def returns():
+    rng = np.random.default_rng(0)
+    index = pd.bdate_range('2022-01-03', periods=600)
+    # 后半段波动放大，使例外集中出现
+    scale = np.where(np.arange(600) < 400, 0.01, 0.02)[:, None]
+    return pd.DataFrame(rng.standard_normal((600, 2)) * scale, index=index, columns=['A', 'B'])
+
+def reference_exceptions(series, window, confidence_level, days):
+    """逐日用截至前一日的 window 天收益率计算 VaR"""
+    hits = []
+    for t in days:
+        var = calculate_risk_metrics(series.iloc[t - window:t], confidence_level)['var']
+        hits.append(series.iloc[t] < var)
+    return np.array(hits)
+
+def test_last_250_days(returns):
+    results, exceptions, forecast = var_backtest(returns, window=100, confidence_level=0.99, test_days=250)
+    assert len(forecast) == 250 and forecast.index[-1] == returns.index[-1]
+    days = range(len(returns) - 250, len(returns))
+    for column in returns.columns:
+        expected = reference_exceptions(returns[column], 100, 0.99, days)
+        np.testing.assert_array_equal(exceptions[column].to_numpy(), expected)
+        assert results.loc[column, 'observations'] == 250
+        assert results.loc[column, 'exceptions'] == expected.sum()
+
+@pytest.mark.parametrize('test_days', [None, 0])
+def test_without_test_days_uses_all_forecasts(returns, test_days):
+    results, exceptions, forecast = var_backtest(returns, window=100, confidence_level=0.99, test_days=test_days)
+    assert len(forecast) == len(returns)
+    assert forecast.iloc[:100].isna().all().all()
+    assert (results['observations'] == len(returns) - 100).all()
+    days = range(100, len(returns))
+    expected = reference_exceptions(returns['A'], 100, 0.99, days)
+    assert results.loc['A', 'exceptions'] == expected.sum()
+
+@pytest.mark.parametrize('count, zone', [(0, '绿'), (4, '绿'), (5, '黄'), (9, '黄'), (10, '红')])
+def test_traffic_light_zones(count, zone):
+    # 250 天 99% VaR 的巴塞尔分区：0-4 绿，5-9 黄，10 以上红
+    exceptions = np.zeros((250, 1), dtype=bool)
+    exceptions[:count] = True
+    result = exception_tests(exceptions, np.ones((250, 1), dtype=bool), 0.99)
+    assert result['exceptions'][0] == count
+    assert result['zone'][0] == zone
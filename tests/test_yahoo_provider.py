@@ -0,0 +1,115 @@
+# test_yahoo_provider.py - 以本地替身 HTTP 服务器测试 Yahoo Finance 数据源
+import json
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+import pandas as pd
+import pytest
+
+from config import DATA_SOURCES
+from src.data_manager import DataManager
+from src.price_cache import PriceCache
+from src.price_store import PriceStore
+from src.yahoo_provider import ProviderError, YahooFinanceProvider
+
+def chart_payload(n_days=5, start_close=100.0):
+    """chart 接口格式的最小响应"""
+    dates = pd.bdate_range('2024-01-02', periods=n_days)
+    closes = [start_close + i for i in range(n_days)]
+    return {'chart': {'result': [{
+        'timestamp': [int(d.timestamp()) for d in dates],
+        'indicators': {'quote': [{
+            'open': closes, 'high': [c + 1 for c in closes], 'low': [c - 1 for c in closes],
+            'close': closes, 'volume': [1000] * n_days,
+        }]},
+    }]}}
+
+class StandIn:
+    """替身服务器的行为：代码 → 依次返回的状态码（最后一个重复使用）"""
+
+    def __init__(self, plan):
+        self.plan = plan
+        self.calls = Counter()
+        self.lock = threading.Lock()
+
+    def status_for(self, ticker):
+        with self.lock:
+            statuses = self.plan.get(ticker, [404])
+            status = statuses[min(self.calls[ticker], len(statuses) - 1)]
+            self.calls[ticker] += 1
+        return status
+
+@pytest.fixture
+def stand_in():
+    behaviour = StandIn({})
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            ticker = unquote(urlparse(self.path).path.rsplit('/', 1)[-1])
+            status = behaviour.status_for(ticker)
+            body = json.dumps(chart_payload()).encode() if status == 200 else b'{}'
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    behaviour.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield behaviour
+    server.shutdown()
+    server.server_close()
+
+def make_provider(stand_in, **kwargs):
+    options = dict(base_url=stand_in.base_url, max_retries=2, retry_delay=0, timeout=5)
+    options.update(kwargs)
+    return YahooFinanceProvider(**options)
+
+def test_retries_after_503(stand_in):
+    stand_in.plan = {'FLAKY': [503, 503, 200]}
+    data = make_provider(stand_in).fetch('FLAKY')
+    assert stand_in.calls['FLAKY'] == 3
+    assert list(data.columns) == ['Open', 'High', 'Low', 'Close', 'Volume']
+    assert len(data) == 5 and data['Close'].iloc[-1] == 104.0
+
+def test_gives_up_after_max_retries(stand_in):
+    stand_in.plan = {'DOWN': [503]}
+    with pytest.raises(ProviderError, match='DOWN'):
+        make_provider(stand_in).fetch('DOWN')
+    assert stand_in.calls['DOWN'] == 3
+
+def test_404_fails_fast(stand_in):
+    stand_in.plan = {'MISSING': [404]}
+    with pytest.raises(ProviderError, match='404'):
+        make_provider(stand_in).fetch('MISSING')
+    assert stand_in.calls['MISSING'] == 1
+
+def test_fetch_many_reports_errors_per_ticker(stand_in):
+    stand_in.plan = {'AAA': [200], 'BBB': [503, 200], 'CCC': [404]}
+    results, errors = make_provider(stand_in, batch_size=1).fetch_many(['AAA', 'BBB', 'CCC', 'AAA'])
+    assert sorted(results) == ['AAA', 'BBB']
+    assert list(errors) == ['CCC']
+    assert stand_in.calls['AAA'] == 1
+
+def test_failed_tickers_fall_back_to_mock(stand_in, tmp_path):
+    stand_in.plan = {'AAA': [200], 'CCC': [404]}
+    manager = DataManager(
+        cache=PriceCache(cache_dir=tmp_path / 'cache', enabled=False),
+        store=PriceStore(tmp_path / 'store'),
+        provider=make_provider(stand_in),
+    )
+    manager.source = DATA_SOURCES['primary']
+
+    histories = manager._fetch_histories(['AAA', 'CCC'])
+    real, real_source = histories['AAA']
+    mock, mock_source = histories['CCC']
+    assert real_source == DATA_SOURCES['primary'] and len(real) == 5
+    assert mock_source == DATA_SOURCES['fallback']
+    pd.testing.assert_frame_equal(mock, manager.generate_mock_data('CCC', '5y'))